@@ -3,21 +3,109 @@ Reference:
 - https://github.com/adamyoung600/WRX_HUD/blob/master/Hardware/SH1106/SH1106LCD.py
 - https://github.com/olikraus/u8g2/blob/master/csrc/u8x8_d_sh1106_64x32.c
 """
-from smbus2 import SMBus
+import contextlib
+import errno
+import functools
+import logging
+from smbus2 import SMBus, i2c_msg
 import time
-from PIL import Image
+import threading
 import traceback
-from .SH1106FontLib import CAP_FONT_TOP, CAP_FONT_BOTTOM
-from .Line1SH1106FontLib import Line1
-from .SH1106FontLibNumbers import Number1
-from .SH1106FontLibNumbers1 import Number2
+from .fontatlas import get_font
+from .imagecache import DEFAULT_CACHE_DIR, ImageCache
+from .render import compile_spans, rdwr_span_cost, smbus_span_cost
+from .retry import BusUnavailableError, CircuitBreaker, RetryPolicy
+from .stats import KIND_COMMAND, KIND_DATA, TransportStats
 
 MAX_BUFFER_LENGTH = 32
+# Limit on the number of messages in a single I2C_RDWR ioctl
+# (I2C_RDWR_IOCTL_MAX_MSGS in the kernel).
+MAX_RDWR_MESSAGES = 42
 WIDTH_PIXELS = 132
 COLUMNS = 16
 ROWS = 8
 PIXELS_PER_ROW = 8
 HEIGHT_PIXELS = ROWS * PIXELS_PER_ROW
+# For some reason, the LCD does not seem to be correctly set up to display on
+# the first two column addresses, so every column is shifted by this amount.
+COLUMN_OFFSET = 2
+# Number of rendered strings kept by the LRU render cache
+RENDER_CACHE_SIZE = 128
+# Contrast set at initialization (0 - 255)
+DEFAULT_CONTRAST = 0x7F
+# Default frame rate limit of the background flusher
+DEFAULT_MAX_FPS = 20
+
+# Transport modes.  TRANSPORT_I2C_RDWR sends whole pages (or several spans)
+# as combined I2C_RDWR transactions and falls back to TRANSPORT_SMBUS, which
+# splits data into MAX_BUFFER_LENGTH SMBus block writes, when the adapter
+# rejects them.
+TRANSPORT_SMBUS = "smbus"
+TRANSPORT_I2C_RDWR = "i2c_rdwr"
+# Errors with which an adapter rejects I2C_RDWR transactions it does not
+# support.  These are not retried and make the transport fall back.
+RDWR_UNSUPPORTED_ERRNOS = frozenset(
+    (errno.EINVAL, errno.EMSGSIZE, errno.ENOSYS, errno.EOPNOTSUPP)
+)
+
+logger = logging.getLogger(__name__)
+
+
+class GlyphCache:
+    """Ready-to-send page bytes for every character of a font, each glyph
+    with its spacer column already appended, in normal and inverted form.
+    """
+
+    def __init__(self, font):
+        self.normal = [bytes(glyph) + b"\x00" for glyph in font]
+        self.inverted = [bytes(b ^ 0xFF for b in glyph) for glyph in self.normal]
+
+    def render(self, inString, invert=False):
+        """Returns the page bytes for inString."""
+        glyphs = self.inverted if invert else self.normal
+        # Subtract 32 from the ascii value as the font does not have any
+        # characters before the 32nd implemented.
+        return b"".join([glyphs[ord(c) - 32] for c in inString])
+
+
+class DisplayFlusher(threading.Thread):
+    """Background thread flushing the framebuffer of an SH1106LCD at no
+    more than max_fps.  Draw calls only request a flush, so everything drawn
+    between two frames goes out together and intermediate states that were
+    overwritten before the next frame are never sent.
+    """
+
+    def __init__(self, lcd, max_fps=DEFAULT_MAX_FPS):
+        super().__init__(name="SH1106 flusher", daemon=True)
+        self._lcd = lcd
+        self._interval = 1.0 / max_fps
+        self._pending = threading.Event()
+        self._stopping = False
+
+    def request(self):
+        """Asks for the framebuffer to be flushed at the next frame."""
+        self._pending.set()
+
+    def stop(self):
+        """Flushes whatever is pending and stops the thread."""
+        self._stopping = True
+        self._pending.set()
+        self.join()
+
+    def run(self):
+        while True:
+            self._pending.wait()
+            self._pending.clear()
+            frame_start = time.monotonic()
+            try:
+                self._lcd.flush()
+            except Exception:
+                logger.exception("Display flush failed")
+            if self._stopping:
+                break
+            delay = self._interval - (time.monotonic() - frame_start)
+            if delay > 0:
+                time.sleep(delay)
 
 
 class SH1106LCD:
@@ -33,6 +121,15 @@ class SH1106LCD:
     bit (D0) represents the top-most row of the page.  The most
     significant bit (D7) represents the bottom-most row of the page.
 
+    All drawing goes to an in-memory framebuffer mirroring the Display
+    Data RAM.  flush() compares it against what was last sent to the
+    panel and transmits only the column spans that changed on each page.
+    With auto_flush enabled (the default) every draw call is flushed
+    immediately.  With async_flush, draw calls return at once and a
+    DisplayFlusher thread sends the changes at up to max_fps.  Draw calls
+    made within a frame() block are held back and sent together when the
+    block ends, see render.compile_spans for how the spans are chosen.
+
     Changes to the Display Data RAM are immediately reflected on the
     actual LCD.  When writing bytes to the RAM, the column position is
     automatically incremented with each byte allowing continuous writing
@@ -63,6 +160,9 @@ class SH1106LCD:
 
     COLUMNS = COLUMNS
     ROWS = ROWS
+    # Display Data RAM width, and the RAM column shown at the left edge
+    RAM_COLUMNS = WIDTH_PIXELS
+    COLUMN_OFFSET = COLUMN_OFFSET
 
     SET_LOWER_COLUMN_ADDR = 0x00
     SET_HIGHER_COLUMN_ADDR = 0x10
@@ -90,100 +190,241 @@ class SH1106LCD:
     SET_END = 0xEE
     SET_NOP = 0xE3
 
-    def __init__(self):
-        # Default i2c bus
-        try:
-            self.bus = SMBus(1)
-        except FileNotFoundError:
-            raise RuntimeError(
-                "i2c interface not found. Ensure it is enabled with:"
-                + " modprobe i2c-dev"
-            )
+    def __init__(
+        self,
+        transport=TRANSPORT_I2C_RDWR,
+        async_flush=False,
+        max_fps=DEFAULT_MAX_FPS,
+        bus=None,
+        image_cache_dir=DEFAULT_CACHE_DIR,
+        retry_policy=None,
+        bus_number=1,
+        address=0x3C,
+    ):
+        """transport - TRANSPORT_I2C_RDWR or TRANSPORT_SMBUS
+        async_flush - Flush the framebuffer from a background thread
+        max_fps - Maximum number of flushes per second with async_flush
+        bus - SMBus compatible object to use instead of i2c bus 1, such as
+              emulator.FakeSMBus
+        image_cache_dir - Directory caching images converted by addImage, or
+                          None to always convert them
+        retry_policy - RetryPolicy for failed I2C transactions, defaults to
+                       RetryPolicy()
+        bus_number - Number of the i2c bus (/dev/i2c-N) the display is on
+        address - I2C address of the display
+        """
+        if transport not in (TRANSPORT_SMBUS, TRANSPORT_I2C_RDWR):
+            raise ValueError("Unknown transport: {}".format(transport))
+        self.transport = transport
+
+        if bus is not None:
+            self.bus = bus
+        else:
+            try:
+                self.bus = SMBus(bus_number)
+            except FileNotFoundError:
+                raise RuntimeError(
+                    "i2c interface not found. Ensure it is enabled with:"
+                    + " modprobe i2c-dev"
+                )
 
-        self.OLED_Address = 0x3C
+        self.OLED_Address = address
         self.OLED_Command_Mode = 0x80
+        self.OLED_Command_Stream = 0x00
         self.OLED_Data_Mode = 0x40
+        self.stats = TransportStats()
+        self.retryPolicy = retry_policy if retry_policy is not None else RetryPolicy()
+        self._breaker = CircuitBreaker(self.retryPolicy)
+        # Set when a transaction was lost, so that the panel no longer matches
+        # _panel.  The next flush then rewrites the whole panel.
+        self._resyncPending = False
+
+        # Framebuffer holding the wanted Display Data RAM contents and a copy
+        # of what was last sent to the panel.  Both are indexed by RAM column.
+        self.auto_flush = True
+        self._framebuffer = [bytearray(self.RAM_COLUMNS) for _ in range(ROWS)]
+        self._panel = [bytearray(self.RAM_COLUMNS) for _ in range(ROWS)]
+        self._dirty = [None] * ROWS
+        # Number of open frame() blocks
+        self._frameDepth = 0
+        # _fbLock guards the framebuffer, _busLock keeps multi-transaction
+        # operations such as a cursor move followed by data together.
+        self._fbLock = threading.RLock()
+        self._busLock = threading.RLock()
+        self._flusher = None
 
         # Initialize the screen.
         self._display_is_on = False
+        self.contrast = DEFAULT_CONTRAST
+        self.startLine = 0
+        self.multiplexRows = HEIGHT_PIXELS
         self.__initialize()
 
         # Set up internal image buffer
         self.imageBuffer = {}
+        self._imageCache = None
+        if image_cache_dir is not None:
+            self._imageCache = ImageCache(image_cache_dir)
+
+        # Pre-render the glyphs of the fonts used by the menus
+        self._glyphs = {}
+        self.__glyphCache(self.font)
+        self.__glyphCache(self.font1)
+        # Fully rendered strings, keyed by (text, font, inverted).  Top and
+        # bottom halves of a string use different fonts and are cached apart.
+        self.__renderCached = functools.lru_cache(maxsize=RENDER_CACHE_SIZE)(
+            self.__renderUncached
+        )
+
+        if async_flush:
+            self._flusher = DisplayFlusher(self, max_fps)
+            self._flusher.start()
+
+    def close(self):
+        """Stops the background flusher, sending any pending changes."""
+        if self._flusher is not None:
+            self._flusher.stop()
+            self._flusher = None
 
-        # Import font
-        self.font = CAP_FONT_TOP
-        self.font1 = CAP_FONT_BOTTOM
-        self.fontLine1 = Line1
-        self.fontNumber = CAP_FONT_TOP
-        self.fontNumber1 = CAP_FONT_BOTTOM
+    # Fonts are loaded through the font registry the first time they are used
+
+    @property
+    def font(self):
+        return get_font("CAP_FONT_TOP")
+
+    @property
+    def font1(self):
+        return get_font("CAP_FONT_BOTTOM")
+
+    @property
+    def fontLine1(self):
+        return get_font("Line1")
+
+    @property
+    def fontNumber(self):
+        return get_font("CAP_FONT_TOP")
+
+    @property
+    def fontNumber1(self):
+        return get_font("CAP_FONT_BOTTOM")
 
     def __initialize(self):
         """Initilizes the LCD.  Values are taken from the SH1106 datasheet."""
 
         time.sleep(0.25)
 
-        self.__sendCommand(self.SET_DISPLAY_OFF)
-        self.__sendCommand(self.SET_COMMON_OUTPUT_SCAN_DIR)
-
-        self.__sendCommand(self.SET_LOWER_COLUMN_ADDR)
-        self.__sendCommand(self.SET_HIGHER_COLUMN_ADDR)
-        self.__sendCommand(self.SET_DISPLAY_START_LINE)
-
-        self.__sendCommand(self.SET_CONTRAST_CONTROL_MODE)
-        self.__sendCommand(0x7F)  # 0-255
-        self.__sendCommand(self.SET_SEGMENT_REMAP_LEFT)
-        self.__sendCommand(self.SET_REVERSE_OFF)
-        self.__sendCommand(self.SET_SEGMENT_REMAP_RIGHT)
-        self.__sendCommand(self.SET_PUMP_VOLTAGE | 0x3)  # was 0x3F
-        self.__sendCommand(self.SET_ENTIRE_DISPLAY_OFF)
-        self.__sendCommand(self.SET_DISPLAY_OFFSET_MODE)
-        self.__sendCommand(0x00)  # 0-63
-        self.__sendCommand(self.SET_DIVIDE_RATIO_OSC_FREQ_MODE)
-        # A3-A0 is clock divide ratio, A7-A4 is oscillator frequency adjustment.
-        # 0b0101 (5) is nominal, less is slower, more is faster
-        self.__sendCommand(0xF0)
-        self.__sendCommand(self.SET_PRECHARGE_PERIOD_MODE)
-        # A3-A0 is pre-charge period, default is 2.
-        # A7-A4 is dis-charge period, default is 2.
-        self.__sendCommand(0x22)
-        self.__sendCommand(self.SET_COMMON_PADS_HARDWARE_CONFIG)
-        self.__sendCommand(0x12)  # 0x2(sequential) or 0x12 (alternative)
-        self.__sendCommand(self.SET_VCOM_DESELECT_LEVEL_MODE)
-        # Common pad output voltage, Vcom = (0.430 + A[7:0] X 0.006415) X Vref
-        self.__sendCommand(0x20)  # beta = 0.63528
-        self.clearScreen()
+        self.sendCommands(self._setupCommands())
+        self.clearRam()
         self.display_on()
 
         time.sleep(0.1)
 
+    def _setupCommands(self):
+        """Returns the commands configuring the panel, leaving the display
+        off.
+        """
+        return [
+            self.SET_DISPLAY_OFF,
+            self.SET_COMMON_OUTPUT_SCAN_DIR,
+            self.SET_LOWER_COLUMN_ADDR,
+            self.SET_HIGHER_COLUMN_ADDR,
+            self.SET_DISPLAY_START_LINE,
+            self.SET_CONTRAST_CONTROL_MODE,
+            DEFAULT_CONTRAST,  # 0-255
+            self.SET_SEGMENT_REMAP_LEFT,
+            self.SET_REVERSE_OFF,
+            self.SET_SEGMENT_REMAP_RIGHT,
+            self.SET_PUMP_VOLTAGE | 0x3,  # was 0x3F
+            self.SET_ENTIRE_DISPLAY_OFF,
+            self.SET_DISPLAY_OFFSET_MODE,
+            0x00,  # 0-63
+            self.SET_DIVIDE_RATIO_OSC_FREQ_MODE,
+            # A3-A0 is clock divide ratio, A7-A4 is oscillator frequency
+            # adjustment. 0b0101 (5) is nominal, less is slower, more is
+            # faster
+            0xF0,
+            self.SET_PRECHARGE_PERIOD_MODE,
+            # A3-A0 is pre-charge period, default is 2.
+            # A7-A4 is dis-charge period, default is 2.
+            0x22,
+            self.SET_COMMON_PADS_HARDWARE_CONFIG,
+            0x12,  # 0x2(sequential) or 0x12 (alternative)
+            self.SET_VCOM_DESELECT_LEVEL_MODE,
+            # Common pad output voltage,
+            # Vcom = (0.430 + A[7:0] X 0.006415) X Vref
+            0x20,  # beta = 0.63528
+        ]
+
     def display_on(self):
         """Turns on the lighting of the LCD.  Will display whatever
         is in the Display Data Ram. Display Data RAM can be
         altered while the LCD is powered down.
         """
-        self.__sendCommand(self.SET_DISPLAY_ON)
+        with self._busLock:
+            self.__sendCommand(self.SET_DISPLAY_ON)
         self._display_is_on = True
 
     def display_off(self):
         """Turns off the lighting of the LCD.  LCD will retain
         whatever is in the Display Data Ram.
         """
-        self.__sendCommand(self.SET_DISPLAY_OFF)
+        with self._busLock:
+            self.__sendCommand(self.SET_DISPLAY_OFF)
         self._display_is_on = False
 
+    def setContrast(self, contrast):
+        """contrast - Contrast (brightness) level of the LCD (0 - 255)
+
+        Takes effect immediately, without redrawing the display.
+        """
+        self.sendCommands([self.SET_CONTRAST_CONTROL_MODE, contrast])
+        self.contrast = contrast
+
+    def setStartLine(self, line):
+        """line - The Display Data RAM row shown at the top of the panel (0 - 63)
+
+        Scrolls the whole display vertically without rewriting the RAM.
+        """
+        self.startLine = line % HEIGHT_PIXELS
+        self.sendCommands([self.SET_DISPLAY_START_LINE | self.startLine])
+
+    def setMultiplexRatio(self, rows):
+        """rows - Number of panel rows driven, from the top (16 - 64)
+
+        The Display Data RAM rows past the first rows from the start
+        line are not shown, leaving room to draw off-screen.
+        """
+        self.multiplexRows = rows
+        self.sendCommands([self.SET_MULTIPLEX_RATIO_MODE, rows - 1])
+
+    def marquee(self, text):
+        """text - Text too long for one line
+
+        Starts scrolling text through the top of the display and returns
+        the Marquee controlling it: step() scrolls it by one pixel row and
+        stop() gives the display back.  See marquee.Marquee.
+        """
+        # marquee imports this module
+        from .marquee import Marquee
+
+        return Marquee(self, text)
+
     def clearRow(self, row):
         """row - The row to blank (0 - 7)
 
         Writes 0x00 to every address in Display Data Ram
         for a given row.  This will blank the row.
         """
-        page = self.SET_PAGE_ADDR + row
-        self.__sendCommand(page)
-        row_data = [0x00] * WIDTH_PIXELS
-        self.sendData(row_data)
+        row_data = [0x00] * self.RAM_COLUMNS
+        with self._busLock:
+            self.__setRamPosition(row, 0)
+            self.sendData(row_data)
+            with self._fbLock:
+                self._framebuffer[row][:] = row_data
+                self._panel[row][:] = row_data
+                self._dirty[row] = None
 
-    def clearScreen(self, keep_display_off=False):
+    def clearRam(self, keep_display_off=False):
         """Writes 0x00 to every address in the Display Data Ram
         effectively making the screen completely black.
         Should be called on first connection of the LCD as
@@ -193,33 +434,340 @@ class SH1106LCD:
         self.display_off()
         for row in range(ROWS):
             self.clearRow(row)
-            self.__sendCommand(self.SET_LOWER_COLUMN_ADDR)  # reset column address
-            self.__sendCommand(self.SET_HIGHER_COLUMN_ADDR)  # reset column address
         if previous_state and not keep_display_off:
             self.display_on()
 
+    def clearScreen(self, keep_display_off=False):
+        """Makes the screen completely black.  Only the columns that
+        currently have pixels set are written, see clear_region.
+
+        keep_display_off - Turn the display off as well
+        """
+        if keep_display_off:
+            self.display_off()
+        self.clear_region(range(ROWS))
+
+    def clear_region(self, page_range, col_range=None):
+        """Blanks a rectangular region of the display.  The framebuffer is
+        cleared and flushed, so zeros are only written where pixels are
+        currently set.
+
+            page_range - range of rows (pages) to clear, e.g. range(5, 7)
+            col_range - range of display columns to clear, as used by
+                        setCursorPosition.  Defaults to the whole row.
+        """
+        if col_range is None:
+            col_range = range(
+                -self.COLUMN_OFFSET, self.RAM_COLUMNS - self.COLUMN_OFFSET
+            )
+        if not col_range:
+            return
+        blank = bytes(col_range[-1] + 1 - col_range[0])
+        for row in page_range:
+            self._draw(row, col_range[0], blank)
+        self._refresh()
+
     def setCursorPosition(self, row, col):
         """
         row - The row to place the cursor on (0 - 7)
         col - The column to place the cursor on (0 - 31)
         """
+        self.__setRamPosition(row, col + self.COLUMN_OFFSET)
+
+    def __setRamPosition(self, row, col):
+        """Positions the RAM write pointer without applying COLUMN_OFFSET.
+
+        row - The page to write to (0 - 7)
+        col - The RAM column to write to (0 - 131)
+        """
+        self.sendCommands(self._positionCommands(row, col))
+
+    def _spanCost(self):
+        """Returns the function giving the bits taken by a span of a given
+        length written with the transport, see render.compile_spans.
+        """
+        cursor_commands = len(self._positionCommands(0, 0))
+        if self.transport == TRANSPORT_I2C_RDWR:
+            return functools.partial(rdwr_span_cost, cursor_commands=cursor_commands)
+        return functools.partial(
+            smbus_span_cost,
+            block_length=MAX_BUFFER_LENGTH,
+            cursor_commands=cursor_commands,
+        )
+
+    def _positionCommands(self, row, col):
+        """Returns the commands moving the RAM write pointer to the given
+        page and RAM column.
+        """
         # Set row
         page = self.SET_PAGE_ADDR + row
-        self.__sendCommand(page)
-        # For some reason, the LCD does not seem to be correctly set up to
-        # display on the first two collumn addresses. Therefore increase the
-        # column value by 2
-        col = col + 2
 
         # Calculate the command bytes to set the column address
         # Column Address Offset: A7 A6 A5 A4 A3 A2 A1 A0
-        # Upper Address Nibble Command: 0 0 0 0 A3 A2 A1 A0
-        # Lower Address Nibble Command: 0 0 0 1 A7 A6 A5 A4
+        # Upper Address Nibble Command: 0 0 0 1 A7 A6 A5 A4
+        # Lower Address Nibble Command: 0 0 0 0 A3 A2 A1 A0
         lowerColumnOffsetByte = col & 0x0F
         upperColumnOffsetByte = (col >> 4) + self.SET_HIGHER_COLUMN_ADDR
-        # Set column
-        self.__sendCommand(upperColumnOffsetByte)  # Upper 4 bits
-        self.__sendCommand(lowerColumnOffsetByte)  # Lower 4 bits
+        return [page, upperColumnOffsetByte, lowerColumnOffsetByte]
+
+    def flush(self):
+        """Sends every framebuffer span that differs from what is currently
+        on the panel.  Pages that were not drawn to since the last flush are
+        skipped without being compared.
+
+        While the circuit breaker keeps the bus closed off nothing is sent
+        and the changes stay in the framebuffer.  After transactions were
+        lost, the whole panel is resynchronized instead, see resync.
+        """
+        with self._busLock:
+            if not self._breaker.allow():
+                return
+            span_cost = self._spanCost()
+            spans = []
+            with self._fbLock:
+                if self._frameDepth:
+                    # Sent when the frame is complete, resync included
+                    return
+                if self._resyncPending:
+                    self.resync()
+                    return
+                for row in range(ROWS):
+                    if self._dirty[row] is None:
+                        continue
+                    start, end = self._dirty[row]
+                    self._dirty[row] = None
+                    wanted = self._framebuffer[row]
+                    sent = self._panel[row]
+                    for span_start, span_end in compile_spans(
+                        wanted, sent, start, end, span_cost
+                    ):
+                        data = wanted[span_start:span_end]
+                        spans.append((row, span_start, bytes(data)))
+                        sent[span_start:span_end] = data
+            self._writeSpans(spans)
+
+    def resync(self):
+        """Reconfigures the panel and rewrites the whole Display Data RAM
+        from the framebuffer, restoring the contrast, start line, multiplex
+        ratio and display state.  Used to recover from lost transactions, after which the
+        panel may have been reset or left partially drawn.
+        """
+        with self._busLock:
+            self._resyncPending = False
+            with self._fbLock:
+                spans = []
+                for row in range(ROWS):
+                    self._panel[row][:] = self._framebuffer[row]
+                    self._dirty[row] = None
+                    spans.append((row, 0, bytes(self._framebuffer[row])))
+            self.sendCommands(
+                self._setupCommands()
+                + [
+                    self.SET_CONTRAST_CONTROL_MODE,
+                    self.contrast,
+                    self.SET_DISPLAY_START_LINE | self.startLine,
+                    self.SET_MULTIPLEX_RATIO_MODE,
+                    self.multiplexRows - 1,
+                ]
+            )
+            self._writeSpans(spans)
+            if self._display_is_on:
+                self.__sendCommand(self.SET_DISPLAY_ON)
+
+    def _writeSpans(self, spans):
+        """spans - List of (row, RAM column, data) to write to the panel."""
+        self._writeBlocks(
+            [(self._positionCommands(row, col), data) for row, col, data in spans]
+        )
+
+    def _writeBlocks(self, blocks):
+        """blocks - List of (commands, data) to send, each moving the RAM
+        write pointer and writing data from there.
+
+        With TRANSPORT_I2C_RDWR every block becomes a command message followed
+        by a data message, and as many blocks as the adapter allows go out in
+        a single combined transaction.  With TRANSPORT_SMBUS the commands and
+        the first data bytes of every block share a block write.
+        """
+        if self.transport == TRANSPORT_I2C_RDWR:
+            messages = []
+            for commands, data in blocks:
+                messages.append(self.__commandMessage(commands))
+                messages.append(self.__dataMessage(data))
+            sent = 0
+            for i in range(0, len(messages), MAX_RDWR_MESSAGES):
+                if not self.__sendMessages(
+                    KIND_DATA, messages[i : i + MAX_RDWR_MESSAGES]
+                ):
+                    break
+                sent = i + MAX_RDWR_MESSAGES
+            # Anything left over goes out through the SMBus fallback below
+            blocks = blocks[sent // 2 :]
+        for commands, data in blocks:
+            self.__sendBlock(commands, data)
+
+    def __sendBlock(self, commands, data):
+        """Sends commands followed by data with SMBus block writes.  The
+        first block chains the commands and the start of the data using
+        control bytes with the Co bit set.
+        """
+        header = []
+        for command in commands:
+            header.extend((command, self.OLED_Command_Mode))
+        header[-1] = self.OLED_Data_Mode
+        first = MAX_BUFFER_LENGTH - len(header)
+        block = header + list(data[:first])
+        self.__transfer(
+            KIND_DATA,
+            len(block) + 1,
+            self.bus.write_i2c_block_data,
+            self.OLED_Address,
+            self.OLED_Command_Mode,
+            block,
+        )
+        for chunk in self.__chunks(list(data[first:]), MAX_BUFFER_LENGTH):
+            self.__sendData(chunk)
+
+    def _draw(self, row, col, data):
+        """Copies data into the framebuffer at the given row and display
+        column, clipping whatever falls outside of the Display Data RAM.
+
+        row - Row (page) to draw on (0 - 7)
+        col - Display column of the first byte, as for setCursorPosition
+        data - Iterable of page bytes
+        """
+        if not 0 <= row < ROWS:
+            return
+        start = int(col) + self.COLUMN_OFFSET
+        data = bytes(data)
+        if start < 0:
+            data = data[-start:]
+            start = 0
+        end = min(start + len(data), self.RAM_COLUMNS)
+        if end <= start:
+            return
+        with self._fbLock:
+            self._framebuffer[row][start:end] = data[: end - start]
+            dirty = self._dirty[row]
+            if dirty is None:
+                self._dirty[row] = (start, end)
+            else:
+                self._dirty[row] = (min(dirty[0], start), max(dirty[1], end))
+
+    @contextlib.contextmanager
+    def frame(self):
+        """Collects every draw call made in the with block into one frame,
+        which is compiled and sent when the block ends:
+
+            with lcd.frame():
+                lcd.displayString("PHCOMP ", 0, 5)
+                lcd.displayString("| ", 0, 64)
+                lcd.displayString("DIS", 0, 80)
+
+        Frames may be nested, only the outermost one is sent.
+        """
+        with self._fbLock:
+            self._frameDepth += 1
+        try:
+            yield self
+        finally:
+            with self._fbLock:
+                self._frameDepth -= 1
+                complete = self._frameDepth == 0
+            if complete:
+                self._refresh()
+
+    def _refresh(self):
+        """Hands the framebuffer to the background flusher, or flushes it
+        right away if auto_flush is enabled.  Nothing is sent while a frame
+        is being drawn.
+        """
+        if self._frameDepth:
+            return
+        if self._flusher is not None:
+            self._flusher.request()
+        elif self.auto_flush:
+            self.flush()
+
+    def __glyphCache(self, font):
+        """Returns the GlyphCache for font, building it on first use."""
+        cache = self._glyphs.get(id(font))
+        if cache is None:
+            cache = self._glyphs[id(font)] = GlyphCache(font)
+        return cache
+
+    def __renderString(self, inString, font, invert=False):
+        """Returns the page bytes for inString drawn with font, each glyph
+        followed by a spacer column.
+        """
+        self.__glyphCache(font)
+        return self.__renderCached(inString, id(font), invert)
+
+    def __renderUncached(self, inString, fontKey, invert):
+        return self._glyphs[fontKey].render(inString, invert)
+
+    def renderCacheInfo(self):
+        """Returns the hits, misses, maxsize and currsize of the string
+        render cache.
+        """
+        return self.__renderCached.cache_info()
+
+    def transportStats(self):
+        """Returns a snapshot of the I2C transaction, byte, retry, failure and
+        latency counters, broken down into command and data transfers, along
+        with the state of the circuit breaker.
+        """
+        stats = self.stats.snapshot()
+        stats["circuit"] = self._breaker.state
+        return stats
+
+    def __transfer(self, kind, nbytes, write, *args):
+        """Calls write(*args) to perform one bus transaction, retrying as
+        allowed by the retry policy, and records it in the transport
+        statistics.  Nothing is attempted while the circuit breaker is open.
+
+        kind - KIND_COMMAND or KIND_DATA
+        nbytes - Number of bytes written, for the statistics
+
+        Returns None on success, or the IOError of the last attempt.
+        """
+        if not self._breaker.allow():
+            self.stats.drop(kind)
+            self._resyncPending = True
+            return BusUnavailableError("I2C bus unavailable, transaction dropped")
+        policy = self.retryPolicy
+        start = time.monotonic()
+        retries = 0
+        while True:
+            try:
+                write(*args)
+            except IOError as err:
+                if err.errno in RDWR_UNSUPPORTED_ERRNOS and write == self.bus.i2c_rdwr:
+                    # The adapter is fine, it just cannot do this
+                    self.stats.record(
+                        kind, nbytes, time.monotonic() - start, retries, True
+                    )
+                    return err
+                if retries + 1 >= policy.attempts:
+                    self.stats.record(
+                        kind, nbytes, time.monotonic() - start, retries, True
+                    )
+                    self._resyncPending = True
+                    if self._breaker.failure():
+                        logger.warning(
+                            "I2C transfers keep failing ({}), pausing the display"
+                            " for {}s".format(err, policy.reset_timeout)
+                        )
+                    return err
+                time.sleep(policy.delay(retries))
+                retries += 1
+            else:
+                self.stats.record(kind, nbytes, time.monotonic() - start, retries)
+                if self._breaker.success():
+                    logger.info("I2C bus recovered, resynchronizing the display")
+                    if self._flusher is not None:
+                        self._flusher.request()
+                return None
 
     def __sendCommand(self, command):
         """command - Hex data to send to the OLED as a command
@@ -230,69 +778,138 @@ class SH1106LCD:
         with the D/C Bit set LOW to tell the OLED that the next data sent will be
         a command
         """
-        retries = 10
-        while retries > 0:
-            try:
-                self.bus.write_byte_data(
-                    self.OLED_Address, self.OLED_Command_Mode, command
+        self.__transfer(
+            KIND_COMMAND,
+            2,
+            self.bus.write_byte_data,
+            self.OLED_Address,
+            self.OLED_Command_Mode,
+            command,
+        )
+
+    def sendCommands(self, commands):
+        """commands - List of command bytes
+
+        Sends all commands in a single transaction.  The control byte has the
+        Co bit cleared, telling the OLED that every following byte is a
+        command.
+        """
+        commands = list(commands)
+        with self._busLock:
+            if self.transport == TRANSPORT_I2C_RDWR:
+                if self.__sendMessages(KIND_COMMAND, [self.__commandMessage(commands)]):
+                    return
+            for chunk in self.__chunks(commands, MAX_BUFFER_LENGTH):
+                self.__transfer(
+                    KIND_COMMAND,
+                    len(chunk) + 1,
+                    self.bus.write_i2c_block_data,
+                    self.OLED_Address,
+                    self.OLED_Command_Stream,
+                    chunk,
                 )
-            except IOError:
-                retries -= 1
-            else:
-                break
 
     def __sendDataByte(self, dataByte):
         """Sends a single display data byte to the Display Data RAM.
 
         dataByte - Single byte of data (in hex) to send to the OLED as display data.
         """
-        retries = 10
-        while retries > 0:
-            try:
-                self.bus.write_byte_data(
-                    self.OLED_Address, self.OLED_Data_Mode, dataByte
-                )
-            except IOError:
-                retries -= 1
-            else:
-                break
+        self.__transfer(
+            KIND_DATA,
+            2,
+            self.bus.write_byte_data,
+            self.OLED_Address,
+            self.OLED_Data_Mode,
+            dataByte,
+        )
 
     def sendDataByte(self, dataByte):
-        self.__sendDataByte(dataByte)
+        with self._busLock:
+            self.__sendDataByte(dataByte)
 
     def sendData(self, data):
         """Send an array of bytes to the device controller."""
-        if len(data) > MAX_BUFFER_LENGTH:
-            splitStream = self.__chunks(list(data), MAX_BUFFER_LENGTH)
-            for chunk in splitStream:
-                self.__sendData(chunk)
-        else:
-            self.__sendData(data)
+        with self._busLock:
+            if self.transport == TRANSPORT_I2C_RDWR:
+                if self.__sendMessages(KIND_DATA, [self.__dataMessage(data)]):
+                    return
+            if len(data) > MAX_BUFFER_LENGTH:
+                splitStream = self.__chunks(list(data), MAX_BUFFER_LENGTH)
+                for chunk in splitStream:
+                    self.__sendData(chunk)
+            else:
+                self.__sendData(data)
 
     def __sendData(self, data):
         """data - Bytestream to send to the Display Data RAM.
         Must not exceed MAX_BUFFER_LENGTH.
         """
-        retries = 10
-        while retries > 0:
-            try:
-                self.bus.write_i2c_block_data(
-                    self.OLED_Address, self.OLED_Data_Mode, data
-                )
-            except IOError:
-                retries -= 1
-            else:
-                break
+        self.__transfer(
+            KIND_DATA,
+            len(data) + 1,
+            self.bus.write_i2c_block_data,
+            self.OLED_Address,
+            self.OLED_Data_Mode,
+            data,
+        )
+
+    def __commandMessage(self, commands):
+        """Builds an I2C_RDWR message sending a stream of commands."""
+        return i2c_msg.write(
+            self.OLED_Address, bytes([self.OLED_Command_Stream]) + bytes(commands)
+        )
+
+    def __dataMessage(self, data):
+        """Builds an I2C_RDWR message writing data to the Display Data RAM."""
+        return i2c_msg.write(
+            self.OLED_Address, bytes([self.OLED_Data_Mode]) + bytes(data)
+        )
+
+    def __sendMessages(self, kind, messages):
+        """kind - KIND_COMMAND or KIND_DATA, for the statistics
+        messages - i2c_msg instances to send as one combined transaction.
+
+        Returns True unless the adapter rejects I2C_RDWR transactions, in
+        which case the transport falls back to TRANSPORT_SMBUS and False is
+        returned so that the caller can resend the data.  Transactions lost
+        to a failing bus are left to resync.
+        """
+        error = self.__transfer(
+            kind, sum(msg.len for msg in messages), self.bus.i2c_rdwr, *messages
+        )
+        if error is None or error.errno not in RDWR_UNSUPPORTED_ERRNOS:
+            return True
+        logger.warning(
+            "I2C_RDWR transfers failed ({}), falling back to SMBus block writes".format(
+                error
+            )
+        )
+        self.transport = TRANSPORT_SMBUS
+        return False
 
     def addImage(self, imageID, filename):
         """Processes an image and adds it to the internal buffer.  This pre-processes
         the image before storing it and avoids unnecessary processing each time you
-        wish to display it.
+        wish to display it.  Processed images are also kept in the on-disk
+        image cache, so that later runs skip the processing.
 
             imageID - String used to identify the stored image.
             filename - File to add.  Must be monochrome bit map
         """
-        processedImage = self.LCDImage(filename)
+        cached = None
+        if self._imageCache is not None:
+            cached = self._imageCache.load(filename)
+        if cached is not None:
+            processedImage = self.LCDImage.fromPages(*cached)
+        else:
+            processedImage = self.LCDImage(filename)
+            if self._imageCache is not None and processedImage.data:
+                self._imageCache.store(
+                    filename,
+                    processedImage.width,
+                    processedImage.height,
+                    processedImage.data,
+                )
         self.imageBuffer[imageID] = processedImage
 
     def displayBufferedImage(self, imageID, rowOffset, colOffset):
@@ -321,57 +938,44 @@ class SH1106LCD:
     def displayStringNumber(self, inString, row, col, wrap=None):
         if wrap is None:
             wrap = False
-        displayStringNumber = inString
-        # Set the row/column position
-        self.setCursorPosition(row, col)
-        for c in displayStringNumber:
-            # Get the ascii value and then subtract 32 as the font does not
-            # have any characters before the 32nd implemented.
-            fontIndex = ord(c) - 32
-            self.__sendData(self.fontNumber[fontIndex])
-            self.__sendDataByte(0x00)
-        self.setCursorPosition(row + 1, col)
-        for c in displayStringNumber:
-            # Get the ascii value and then subtract 32 as the font does not
-            # have any characters before the 32nd implemented.
-            fontIndex = ord(c) - 32
-            self.__sendData(self.fontNumber1[fontIndex])
-            self.__sendDataByte(0x00)
+        self._draw(row, col, self.__renderString(inString, self.fontNumber))
+        self._draw(row + 1, col, self.__renderString(inString, self.fontNumber1))
+        self._refresh()
 
     def displayStringLine1(self, inString, row, col, wrap=None):
         if wrap is None:
             wrap = False
-        displayStringLine1 = inString
-        # Set the row/column position
-        self.setCursorPosition(row, col)
-        for c in displayStringLine1:
-            # Get the ascii value and then subtract 32 as the font does not
-            # have any characters before the 32nd implemented.
-            fontIndex = ord(c) - 32
-            self.__sendData(self.fontLine1[fontIndex])
-            self.__sendDataByte(0x00)
+        self._draw(row, col, self.__renderString(inString, self.fontLine1))
+        self._refresh()
 
     def displayString(self, inString, row, col, wrap=None):
         if wrap is None:
             wrap = False
-        # Convert string to all caps as lower case characters are not
-        # implemented in the font.
-        displayString = inString
-        # Set the row/column position
-        self.setCursorPosition(row, col)
-        for c in displayString:
-            # Get the ascii value and then subtract 32 as the font does not
-            # have any characters before the 32nd implemented.
-            fontIndex = ord(c) - 32
-            self.__sendData(self.font[fontIndex])
-            self.__sendDataByte(0x00)
-        self.setCursorPosition(row + 1, col)
-        for c in displayString:
-            # Get the ascii value and then subtract 32 as the font does not
-            # have any characters before the 32nd implemented.
-            fontIndex = ord(c) - 32
-            self.__sendData(self.font1[fontIndex])
-            self.__sendDataByte(0x00)
+        self._draw(row, col, self.__renderString(inString, self.font))
+        self._draw(row + 1, col, self.__renderString(inString, self.font1))
+        self._refresh()
+
+    def renderString(self, inString, invert=False):
+        """Returns the (top, bottom) page bytes of inString as drawn by
+        displayString, or by displayInvertedString if invert is set.
+        """
+        return (
+            self.__renderString(inString, self.font, invert),
+            self.__renderString(inString, self.font1, invert),
+        )
+
+    def textWidth(self, inString):
+        """Returns the width in columns of inString drawn by displayString or
+        displayInvertedString, including the spacer column after each glyph.
+        """
+        return max(len(page) for page in self.renderString(inString))
+
+    def displayPageBytes(self, data, row, col):
+        """Draws raw page bytes, one column each, starting at the given row
+        (page) and column.  Bit 0 of every byte is the top pixel.
+        """
+        self._draw(row, col, data)
+        self._refresh()
 
     def centerString(self, inString, row):
         inString = str(inString)
@@ -381,31 +985,9 @@ class SH1106LCD:
         self.displayString(inString, row, startPosition)
 
     def displayInvertedString(self, inString, row, col):
-        # Convert string to all caps as lower case characters are not
-        # implemented in the font.
-        # displayString = str(inString).upper()
-        displayString = inString
-        # Set the row/column position
-        self.setCursorPosition(row, col)
-        for c in displayString:
-            # Get the ascii value and then subtract 32 as the font does not
-            # have any characters before the 32nd implemented.
-            fontIndex = ord(c) - 32
-            bytestream = self.font[fontIndex]
-            for b in bytestream:
-                # invert the byte and send it
-                self.__sendDataByte(b ^ 0xFF)
-            self.__sendDataByte(0xFF)
-        self.setCursorPosition(row + 1, col)
-        for c in displayString:
-            # Get the ascii value and then subtract 32 as the font does not
-            # have any characters before the 32nd implemented.
-            fontIndex = ord(c) - 32
-            bytestream = self.font1[fontIndex]
-            for b in bytestream:
-                # invert the byte and send it
-                self.__sendDataByte(b ^ 0xFF)
-            self.__sendDataByte(0xFF)
+        self._draw(row, col, self.__renderString(inString, self.font, invert=True))
+        self._draw(row + 1, col, self.__renderString(inString, self.font1, invert=True))
+        self._refresh()
 
     def __displayProcessedImage(self, processedImage, row, col):
         """Takes an image that has already been processed and displays it on the LCD.
@@ -419,8 +1001,8 @@ class SH1106LCD:
         """
         try:
             # Ensure the picture will fit with the given column and row starting points.
-            if (processedImage.width + col > 132) or (
-                processedImage.height / 8 + row > 8
+            if (processedImage.width + col > self.RAM_COLUMNS) or (
+                len(processedImage.data) + row > 8
             ):
                 raise ValueError(
                     "Picture is too large to fit on the screen with the"
@@ -432,22 +1014,10 @@ class SH1106LCD:
             # Get the raw data from the processed image
             imageData = processedImage.data
 
-            # Display the image
-            for i in range(row, 8):
-                self.setCursorPosition(row, col)
-                # Set column
-                page = self.SET_PAGE_ADDR + i
-                self.__sendCommand(page)
-                # The i2c bus can only take a maximum of 32 bytes of data at a
-                # time. If the image is more than 32 pixels wide we need to
-                # break it into chunks.
-                stream = imageData[i]
-                if len(stream) > MAX_BUFFER_LENGTH:
-                    splitStream = self.__chunks(list(stream), MAX_BUFFER_LENGTH)
-                    for chunk in splitStream:
-                        self.__sendData(chunk)
-                else:
-                    self.__sendData(stream)
+            # Draw the image one page at a time
+            for i, stream in enumerate(imageData):
+                self._draw(row + i, col, stream)
+            self._refresh()
 
         except ValueError:
             print("Value Error: ")
@@ -471,21 +1041,33 @@ class SH1106LCD:
             self.height = 0
             self.data = self.processPicture(filename)
 
+        @classmethod
+        def fromPages(cls, width, height, data):
+            """Creates an LCDImage from already processed page data."""
+            image = cls.__new__(cls)
+            image.width = width
+            image.height = height
+            image.data = data
+            return image
+
         def processPicture(self, filename):
             """Imports a monocrhome bitmap file and converts it into a format
-            that can be displayed on the LCD.  The black pixels of the
-            bitmap will be read as "ON", and white as "OFF" effectively
-            reversing the colors on the actual LCD.
+            that can be displayed on the LCD.  The white pixels of the
+            bitmap will be read as "ON", and black as "OFF".
             *The bitmap cannot be larger than 132 pixels wide or 64 pixels
              tall.
-            *The bitmap's height must be divisible by 8.
+            *If the bitmap's height is not divisible by 8, the last page is
+             padded with "OFF" pixels.
 
                filename - The bitmap file to import.
 
-               Returns - a (list of lists) that can be passed into
-                   the displayImage(filename)
+               Returns - a list holding the bytes of each page, that can be
+                   passed into the displayImage(filename)
             """
 
+            # PIL is only needed for images that are not in the image cache
+            from PIL import Image
+
             output = []
             try:
                 picture = Image.open(filename)
@@ -496,43 +1078,26 @@ class SH1106LCD:
                         "Picture is larger than the allowable 132x64 pixels."
                     )
 
-                # Ensure image file height is divisible by 8
-                # TODO - Should probably just change logic below to properly
-                # handle this case.  Don't need it for now.
-                if height % 8 != 0:
-                    raise ValueError("Picture height is not divisible by 8.")
-
                 # Properly set the width/height class variables
                 self.width = width
                 self.height = height
+                pages = (height + PIXELS_PER_ROW - 1) // PIXELS_PER_ROW
 
-                # Read in the picture as a bitstream.
-                bits = list(picture.getdata())
-
-                # Convert stream of pixels to width x height array
-                matrix = []
-                for i in range(height):
-                    temp = []
-                    for j in range(width):
-                        temp.append(bits[i * width + j])
-                    matrix.append(temp)
-
-                # Convert width x height array
-                for i in range(height / 8):
-                    temp = []
-                    for j in range(width):
-                        bit0 = matrix[i * 8][j] / 255
-                        bit1 = 2 * (matrix[i * 8 + 1][j] / 255)
-                        bit2 = 4 * (matrix[i * 8 + 2][j] / 255)
-                        bit3 = 8 * (matrix[i * 8 + 3][j] / 255)
-                        bit4 = 16 * (matrix[i * 8 + 4][j] / 255)
-                        bit5 = 32 * (matrix[i * 8 + 5][j] / 255)
-                        bit6 = 64 * (matrix[i * 8 + 6][j] / 255)
-                        bit7 = 128 * (matrix[i * 8 + 7][j] / 255)
-                        temp.append(
-                            bit0 + bit1 + bit2 + bit3 + bit4 + bit5 + bit6 + bit7
-                        )
-                    output.append(temp)
+                # Pad the picture to whole pages, flip it upside down and swap
+                # its axes.  Each row of the result then holds one column of
+                # the picture, bottom pixel first, which packs into the page
+                # bytes of that column with D0 as the top-most pixel, last
+                # page first.
+                picture = picture.convert("1", dither=Image.NONE)
+                padded = Image.new("1", (width, pages * PIXELS_PER_ROW))
+                padded.paste(picture, (0, 0))
+                columns = (
+                    padded.transpose(Image.FLIP_TOP_BOTTOM)
+                    .transpose(Image.TRANSPOSE)
+                    .tobytes()
+                )
+                for page in range(pages):
+                    output.append(columns[pages - 1 - page :: pages])
             except IOError:
                 print("I/O error: Could not open file: " + filename)
                 traceback.print_exc()
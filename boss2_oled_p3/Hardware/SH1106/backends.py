@@ -0,0 +1,40 @@
+"""
+Display backends selectable at run time.
+
+A backend is a controller driver drawing to an output.  The drivers,
+SH1106LCD and SSD1306LCD, share the SH1106LCD drawing interface and differ
+only in how the framebuffer is sent.  The output is the real display on the
+i2c bus, an image file or the terminal (see sinks), so the front panel can
+run without hardware and the transfer statistics of both controllers can be
+compared on the same screens.
+
+    lcd = create_display(CONTROLLER_SSD1306, "panel.png")
+"""
+from .SH1106LCD import SH1106LCD
+from .sinks import FileSink, TerminalSink
+from .ssd1306 import SSD1306LCD
+
+CONTROLLER_SH1106 = "sh1106"
+CONTROLLER_SSD1306 = "ssd1306"
+CONTROLLERS = {CONTROLLER_SH1106: SH1106LCD, CONTROLLER_SSD1306: SSD1306LCD}
+
+OUTPUT_I2C = "i2c"
+OUTPUT_TERMINAL = "terminal"
+
+
+def create_display(controller=CONTROLLER_SH1106, output=OUTPUT_I2C, **kwargs):
+    """Returns the driver of the given controller, drawing to output.
+
+    controller - CONTROLLER_SH1106 or CONTROLLER_SSD1306
+    output - OUTPUT_I2C, OUTPUT_TERMINAL or the name of an image file, PGM
+             or PNG by its extension
+    Any other arguments are passed on to the driver.
+    """
+    if controller not in CONTROLLERS:
+        raise ValueError("Unknown display controller: {}".format(controller))
+    lcd_class = CONTROLLERS[controller]
+    if output == OUTPUT_TERMINAL:
+        kwargs["bus"] = TerminalSink(first_column=lcd_class.COLUMN_OFFSET)
+    elif output != OUTPUT_I2C:
+        kwargs["bus"] = FileSink(output, first_column=lcd_class.COLUMN_OFFSET)
+    return lcd_class(**kwargs)
@@ -0,0 +1,59 @@
+"""
+Contrast based dimming of the SH1106.
+
+Fading is done by stepping the contrast with SET_CONTRAST_CONTROL_MODE, one
+two-byte command per step, instead of switching the display off and on.
+"""
+from .SH1106LCD import DEFAULT_CONTRAST
+
+DIM_CONTRAST = 0x08
+FADE_STEPS = 8
+
+
+class Dimmer:
+    """Fades an SH1106LCD between its bright and dim contrast.  Fades are not
+    blocking: update() must be called regularly, and sends one step per call.
+
+        lcd - SH1106LCD to control
+        bright - Contrast used when the display is awake
+        dim - Contrast used when the display is dimmed
+        steps - Number of update() calls a fade takes
+    """
+
+    def __init__(
+        self, lcd, bright=DEFAULT_CONTRAST, dim=DIM_CONTRAST, steps=FADE_STEPS
+    ):
+        self.lcd = lcd
+        self.bright = bright
+        self.dim_level = dim
+        self.steps = steps
+        self._levels = []
+
+    @property
+    def fading(self):
+        return bool(self._levels)
+
+    def fadeTo(self, contrast):
+        """Starts fading from the current contrast to contrast."""
+        start = self.lcd.contrast
+        self._levels = [
+            int(round(start + (contrast - start) * i / self.steps))
+            for i in range(1, self.steps + 1)
+        ]
+
+    def dim(self):
+        """Starts fading down to the dim contrast."""
+        self.fadeTo(self.dim_level)
+
+    def wake(self):
+        """Cancels any fade and restores the bright contrast at once."""
+        self._levels = []
+        if self.lcd.contrast != self.bright:
+            self.lcd.setContrast(self.bright)
+
+    def update(self):
+        """Sends the next step of the current fade, if any."""
+        if self._levels:
+            contrast = self._levels.pop(0)
+            if contrast != self.lcd.contrast:
+                self.lcd.setContrast(contrast)
@@ -0,0 +1,343 @@
+"""
+Emulated SH1106 on a fake I2C bus, for running SH1106LCD without hardware.
+
+FakeSMBus implements the subset of smbus2.SMBus used by the driver.  Every
+write is decoded as an SH1106 control/command/data stream and applied to an
+emulated 132x64 Display Data RAM, while the number of transactions, the
+bytes sent and the modeled bus time are counted.  The SSD1306 addressing
+commands are understood as well, so SSD1306LCD can be run on it too.
+
+    bus = FakeSMBus()
+    lcd = SH1106LCD(bus=bus)
+    lcd.displayString("VOL", 0, 0)
+    print(bus.stats())
+
+Running the module benchmarks a few typical screens on both controllers:
+
+    python3 -m Hardware.SH1106.emulator
+"""
+import errno
+
+from .render import BITS_PER_BYTE, START_BITS, STOP_BITS
+
+OLED_ADDRESS = 0x3C
+RAM_COLUMNS = 132
+RAM_PAGES = 8
+
+# Control byte bits
+CONTROL_CONTINUATION = 0x80
+CONTROL_DATA = 0x40
+
+# Number of argument bytes following the commands that take any
+COMMAND_ARGUMENTS = {
+    0x20: 1,
+    0x21: 2,
+    0x22: 2,
+    0x81: 1,
+    0x8D: 1,
+    0xA8: 1,
+    0xAD: 1,
+    0xD3: 1,
+    0xD5: 1,
+    0xD9: 1,
+    0xDA: 1,
+    0xDB: 1,
+}
+
+# SSD1306 memory addressing modes (command 0x20).  The SH1106 only has page
+# addressing.
+ADDRESSING_HORIZONTAL = 0
+ADDRESSING_VERTICAL = 1
+ADDRESSING_PAGE = 2
+
+# Visible part of the RAM
+PANEL_WIDTH = 128
+PANEL_HEIGHT = RAM_PAGES * 8
+
+STANDARD_MODE_HZ = 100000
+FAST_MODE_HZ = 400000
+
+
+class FakeSMBus:
+    """Drop-in replacement for smbus2.SMBus with an emulated SH1106 at
+    address.  Writes to any other address fail like an unacknowledged
+    transfer.
+    """
+
+    def __init__(self, bus=None, address=OLED_ADDRESS):
+        self.address = address
+        self.ram = [bytearray(RAM_COLUMNS) for _ in range(RAM_PAGES)]
+        self.page = 0
+        self.column = 0
+        self.addressing_mode = ADDRESSING_PAGE
+        self.column_window = (0, RAM_COLUMNS - 1)
+        self.page_window = (0, RAM_PAGES - 1)
+        self.start_line = 0
+        self.display_offset = 0
+        self.multiplex_ratio = PANEL_HEIGHT
+        self.contrast = 0x80
+        self.display_on = False
+        self.reverse = False
+        self.entire_display_on = False
+        self.reset_counters()
+
+    # ------------------------------------------------------------------
+    # smbus2.SMBus interface
+
+    def write_byte_data(self, i2c_addr, register, value, force=None):
+        self._transaction(i2c_addr, [bytes((register, value))])
+
+    def write_i2c_block_data(self, i2c_addr, register, data, force=None):
+        self._transaction(i2c_addr, [bytes([register]) + bytes(data)])
+
+    def i2c_rdwr(self, *i2c_msgs):
+        for msg in i2c_msgs:
+            if msg.addr != self.address:
+                raise OSError(
+                    errno.ENXIO, "No device at address 0x{:02X}".format(msg.addr)
+                )
+        self._transaction(self.address, [bytes(msg) for msg in i2c_msgs])
+
+    def close(self):
+        pass
+
+    # ------------------------------------------------------------------
+    # Counters
+
+    def reset_counters(self):
+        self.transactions = 0
+        self.messages = 0
+        self.bytes = 0
+        self.wire_bits = 0
+
+    def bus_time(self, clock_hz=FAST_MODE_HZ):
+        """Returns the modeled time in seconds spent on the bus so far."""
+        return self.wire_bits / clock_hz
+
+    def stats(self):
+        return {
+            "transactions": self.transactions,
+            "messages": self.messages,
+            "bytes": self.bytes,
+            "bus_time_100khz": self.bus_time(STANDARD_MODE_HZ),
+            "bus_time_400khz": self.bus_time(FAST_MODE_HZ),
+        }
+
+    # ------------------------------------------------------------------
+    # Display RAM access
+
+    def page_data(self, page, start=0, end=RAM_COLUMNS):
+        """Returns the bytes of a RAM page."""
+        return bytes(self.ram[page][start:end])
+
+    def pixel(self, x, y):
+        """Returns True if the RAM bit for column x and row y is set."""
+        return bool(self.ram[y // 8][x] & (1 << (y % 8)))
+
+    def panel(self, first_column=0, width=PANEL_WIDTH):
+        """Returns the pixels shown on the panel as PANEL_HEIGHT rows of
+        width values (0 or 1), for a panel showing the RAM from first_column
+        on.  The display state, start line, display offset, multiplex ratio
+        and reverse mode are applied, rows past the multiplex ratio are dark.
+        """
+        if not self.display_on:
+            return [bytes(width)] * PANEL_HEIGHT
+        if self.entire_display_on:
+            return [bytes([1]) * width] * PANEL_HEIGHT
+        on = 0 if self.reverse else 1
+        columns = range(first_column, first_column + width)
+        rows = []
+        for y in range(PANEL_HEIGHT):
+            if y >= self.multiplex_ratio:
+                rows.append(bytes(width))
+                continue
+            line = (y + self.start_line + self.display_offset) % PANEL_HEIGHT
+            ram = self.ram[line // 8]
+            bit = 1 << (line % 8)
+            rows.append(bytes(on if ram[x] & bit else 1 - on for x in columns))
+        return rows
+
+    def to_image(self):
+        """Returns the Display Data RAM as a 132x64 PIL image."""
+        from PIL import Image
+
+        image = Image.new("1", (RAM_COLUMNS, RAM_PAGES * 8))
+        pixels = image.load()
+        for y in range(RAM_PAGES * 8):
+            for x in range(RAM_COLUMNS):
+                pixels[x, y] = self.pixel(x, y)
+        return image
+
+    # ------------------------------------------------------------------
+    # Protocol decoding
+
+    def _transaction(self, i2c_addr, payloads):
+        if i2c_addr != self.address:
+            raise OSError(errno.ENXIO, "No device at address 0x{:02X}".format(i2c_addr))
+        self.transactions += 1
+        self.messages += len(payloads)
+        self.wire_bits += STOP_BITS
+        for payload in payloads:
+            self.bytes += len(payload)
+            self.wire_bits += START_BITS + BITS_PER_BYTE * (1 + len(payload))
+            self._decode(payload)
+
+    def _decode(self, payload):
+        """Applies the control bytes, commands and data of one message."""
+        commands = []
+        i = 0
+        while i < len(payload):
+            control = payload[i]
+            i += 1
+            if control & CONTROL_CONTINUATION:
+                chunk = payload[i : i + 1]
+                i += 1
+            else:
+                # The last control byte: everything that follows is of one kind
+                chunk = payload[i:]
+                i = len(payload)
+            if control & CONTROL_DATA:
+                self._write_data(chunk)
+            else:
+                commands.extend(chunk)
+                commands = self._run_commands(commands)
+
+    def _write_data(self, data):
+        if self.addressing_mode == ADDRESSING_PAGE:
+            for b in data:
+                if self.column < RAM_COLUMNS:
+                    self.ram[self.page][self.column] = b
+                    self.column += 1
+            return
+        first_column, last_column = self.column_window
+        first_page, last_page = self.page_window
+        for b in data:
+            self.ram[self.page][self.column] = b
+            if self.addressing_mode == ADDRESSING_HORIZONTAL:
+                self.column += 1
+                if self.column > last_column:
+                    self.column = first_column
+                    self.page = self.page + 1 if self.page < last_page else first_page
+            else:
+                self.page += 1
+                if self.page > last_page:
+                    self.page = first_page
+                    self.column = (
+                        self.column + 1 if self.column < last_column else first_column
+                    )
+
+    def _run_commands(self, commands):
+        """Executes commands, returning a trailing command still waiting for
+        its argument bytes.
+        """
+        i = 0
+        while i < len(commands):
+            command = commands[i]
+            count = COMMAND_ARGUMENTS.get(command, 0)
+            if i + count >= len(commands):
+                return commands[i:]
+            self._run_command(command, *commands[i + 1 : i + 1 + count])
+            i += 1 + count
+        return []
+
+    def _run_command(self, command, argument=None, argument2=None):
+        if command <= 0x0F:
+            self.column = (self.column & 0xF0) | command
+        elif command <= 0x1F:
+            self.column = ((command & 0x0F) << 4) | (self.column & 0x0F)
+        elif command == 0x20:
+            self.addressing_mode = argument & 0x03
+        elif command == 0x21:
+            self.column_window = (argument & 0x7F, argument2 & 0x7F)
+            self.column = self.column_window[0]
+        elif command == 0x22:
+            self.page_window = (argument & 0x07, argument2 & 0x07)
+            self.page = self.page_window[0]
+        elif 0x40 <= command <= 0x7F:
+            self.start_line = command & 0x3F
+        elif command == 0x81:
+            self.contrast = argument
+        elif command == 0xA8:
+            self.multiplex_ratio = (argument & 0x3F) + 1
+        elif command == 0xD3:
+            self.display_offset = argument & 0x3F
+        elif command in (0xA4, 0xA5):
+            self.entire_display_on = command == 0xA5
+        elif command in (0xA6, 0xA7):
+            self.reverse = command == 0xA7
+        elif command in (0xAE, 0xAF):
+            self.display_on = command == 0xAF
+        elif 0xB0 <= command <= 0xB7:
+            self.page = command & 0x07
+        # Remaining commands (pump voltage, charge pump, segment remap, scan
+        # direction, timing and voltage settings) do not affect the emulated
+        # RAM.
+
+
+def benchmark(lcd_class):
+    """Prints the transfers of a few typical screens drawn with lcd_class."""
+    import time
+
+    bus = FakeSMBus()
+    lcd = lcd_class(bus=bus)
+    rows = ("SYSINFO", "HV-EN OFF", "FILTER", "F-SPEED-SLO")
+
+    def menu(selected):
+        for i, text in enumerate(rows):
+            if i == selected:
+                lcd.displayInvertedString(text, i * 2, 0)
+            else:
+                lcd.displayString(text, i * 2, 0)
+
+    def filter_row(selected):
+        draw = lcd.displayInvertedString if selected else lcd.displayString
+        draw("PHCOMP ", 0, 5)
+        draw("| ", 0, 64)
+        draw("DIS", 0, 80)
+
+    def filter_row_frame(selected):
+        with lcd.frame():
+            filter_row(selected)
+
+    benchmarks = (
+        ("menu, first draw", lambda: menu(0)),
+        ("menu, unchanged redraw", lambda: menu(0)),
+        ("menu, selection moved", lambda: menu(1)),
+        ("filter row", lambda: filter_row(True)),
+        ("filter row, one frame", lambda: filter_row_frame(False)),
+        ("full frame", lambda: lcd.resync()),
+        ("clear screen", lambda: lcd.clearScreen()),
+    )
+    print(
+        "{:<26}{:>8}{:>8}{:>10}{:>10}{:>10}".format(
+            lcd_class.__name__, "trans", "bytes", "100kHz", "400kHz", "cpu"
+        )
+    )
+    for name, draw in benchmarks:
+        bus.reset_counters()
+        start = time.perf_counter()
+        draw()
+        cpu = time.perf_counter() - start
+        print(
+            "{:<26}{:>8}{:>8}{:>9.2f}ms{:>8.2f}ms{:>8.2f}ms".format(
+                name,
+                bus.transactions,
+                bus.bytes,
+                bus.bus_time(STANDARD_MODE_HZ) * 1000,
+                bus.bus_time(FAST_MODE_HZ) * 1000,
+                cpu * 1000,
+            )
+        )
+
+
+def main():
+    from .SH1106LCD import SH1106LCD
+    from .ssd1306 import SSD1306LCD
+
+    for lcd_class in (SH1106LCD, SSD1306LCD):
+        benchmark(lcd_class)
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""
+Compact binary glyph atlases for the SH1106 fonts.
+
+The font modules describe every glyph as a Python list of column bytes, which
+is slow to import and costly to keep in memory.  An atlas packs a whole font
+into one contiguous bytes blob:
+
+    | magic "SHFA" | version (1) | glyph count (2) | stride (1) |
+    | width of each glyph (glyph count bytes) |
+    | glyph data, each glyph padded to stride bytes |
+
+Glyphs are returned as memoryview slices of the blob, so they can be sent to
+the display without any conversion.
+
+Atlases are written next to the font modules.  Build them ahead of time with:
+
+    python3 -m Hardware.SH1106.fontatlas
+
+Missing or outdated atlases are rebuilt from the font module on first load.
+get_font() loads each font once, the first time it is asked for.
+"""
+import importlib
+import importlib.util
+import os
+import struct
+import sys
+
+MAGIC = b"SHFA"
+VERSION = 1
+HEADER = struct.Struct("<4sBHB")
+ATLAS_DIR = os.path.dirname(os.path.abspath(__file__))
+ATLAS_SUFFIX = ".atlas"
+
+# Font name -> (module, attribute) holding the glyph lists
+FONT_SOURCES = {
+    "CAP_FONT_TOP": ("SH1106FontLib", "CAP_FONT_TOP"),
+    "CAP_FONT_BOTTOM": ("SH1106FontLib", "CAP_FONT_BOTTOM"),
+    "Line1": ("Line1SH1106FontLib", "Line1"),
+    "Number1": ("SH1106FontLibNumbers", "Number1"),
+    "Number2": ("SH1106FontLibNumbers1", "Number2"),
+}
+
+# Fonts loaded so far, by name
+_loaded_fonts = {}
+
+
+class GlyphAtlas:
+    """A font packed into a single bytes blob with a fixed-stride index.
+    Indexing behaves like the glyph lists of the font modules, returning a
+    memoryview of the glyph's column bytes.
+    """
+
+    def __init__(self, blob):
+        magic, version, count, stride = HEADER.unpack_from(blob)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("Not a version {} glyph atlas".format(VERSION))
+        self.stride = stride
+        self._count = count
+        self._blob = memoryview(blob)
+        self._widths = self._blob[HEADER.size : HEADER.size + count]
+        self._dataOffset = HEADER.size + count
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError("glyph index out of range")
+        start = self._dataOffset + index * self.stride
+        return self._blob[start : start + self._widths[index]]
+
+    def __iter__(self):
+        for index in range(self._count):
+            yield self[index]
+
+
+def compile_font(glyphs):
+    """Packs a list of glyphs (lists of column bytes) into an atlas blob."""
+    stride = max(len(glyph) for glyph in glyphs)
+    blob = bytearray(HEADER.pack(MAGIC, VERSION, len(glyphs), stride))
+    blob.extend(len(glyph) for glyph in glyphs)
+    for glyph in glyphs:
+        blob.extend(glyph)
+        blob.extend(bytes(stride - len(glyph)))
+    return bytes(blob)
+
+
+def atlas_path(name):
+    return os.path.join(ATLAS_DIR, name + ATLAS_SUFFIX)
+
+
+def _source_path(name):
+    module, _ = FONT_SOURCES[name]
+    spec = importlib.util.find_spec("." + module, __package__)
+    return spec.origin
+
+
+def build_atlas(name):
+    """Compiles the named font from its module and writes the atlas file.
+    Returns the blob.  Failing to write the file is not an error, as the
+    install directory may be read-only.
+    """
+    module, attribute = FONT_SOURCES[name]
+    glyphs = getattr(importlib.import_module("." + module, __package__), attribute)
+    blob = compile_font(glyphs)
+    path = atlas_path(name)
+    try:
+        with open(path + ".tmp", "wb") as f:
+            f.write(blob)
+        os.replace(path + ".tmp", path)
+    except OSError:
+        pass
+    return blob
+
+
+def load_atlas(name):
+    """Returns the GlyphAtlas for the named font, building it if the atlas
+    file is missing or older than the font module.
+    """
+    path = atlas_path(name)
+    try:
+        if os.path.getmtime(path) >= os.path.getmtime(_source_path(name)):
+            with open(path, "rb") as f:
+                return GlyphAtlas(f.read())
+    except (OSError, TypeError, ValueError, struct.error):
+        pass
+    return GlyphAtlas(build_atlas(name))
+
+
+def get_font(name):
+    """Returns the GlyphAtlas for the named font, loading it on first use."""
+    font = _loaded_fonts.get(name)
+    if font is None:
+        font = _loaded_fonts[name] = load_atlas(name)
+    return font
+
+
+def main():
+    for name in FONT_SOURCES:
+        build_atlas(name)
+        print("Wrote {}".format(atlas_path(name)))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
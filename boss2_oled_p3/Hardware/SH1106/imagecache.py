@@ -0,0 +1,89 @@
+"""
+Persistent cache of images converted to SH1106 page format.
+
+Converted images are stored one per file, keyed by the source path, its
+modification time and its size, so that an edited bitmap is converted again.
+Each file holds:
+
+    | magic "SHIM" | version (1) | width (2) | height (2) | pages (1) |
+    | page data, width bytes per page |
+
+Cached files are memory-mapped on load, and the page data is returned as
+memoryview slices of the mapping.
+"""
+import hashlib
+import mmap
+import os
+import struct
+
+MAGIC = b"SHIM"
+VERSION = 1
+HEADER = struct.Struct("<4sBHHB")
+DEFAULT_CACHE_DIR = "/var/cache/boss2_oled"
+CACHE_SUFFIX = ".img"
+
+
+class ImageCache:
+    """Stores and loads converted images in cache_dir.  Failing to read or
+    write the cache is never an error; the image is simply converted again.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR):
+        self.cache_dir = cache_dir
+
+    def _path(self, filename):
+        """Returns the cache file path for filename, or None if filename
+        cannot be accessed.
+        """
+        try:
+            st = os.stat(filename)
+        except OSError:
+            return None
+        key = "{}\0{}\0{}".format(os.path.abspath(filename), st.st_mtime_ns, st.st_size)
+        digest = hashlib.sha1(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, digest + CACHE_SUFFIX)
+
+    def load(self, filename):
+        """Returns (width, height, pages) for filename if it is in the cache,
+        None otherwise.
+        """
+        path = self._path(filename)
+        if path is None:
+            return None
+        try:
+            with open(path, "rb") as f:
+                mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return None
+        try:
+            magic, version, width, height, pages = HEADER.unpack_from(mapping)
+        except struct.error:
+            return None
+        if (
+            magic != MAGIC
+            or version != VERSION
+            or len(mapping) != HEADER.size + width * pages
+        ):
+            return None
+        view = memoryview(mapping)
+        data = []
+        for page in range(pages):
+            start = HEADER.size + page * width
+            data.append(view[start : start + width])
+        return width, height, data
+
+    def store(self, filename, width, height, pages):
+        """Writes the converted pages of filename to the cache."""
+        path = self._path(filename)
+        if path is None:
+            return
+        blob = bytearray(HEADER.pack(MAGIC, VERSION, width, height, len(pages)))
+        for page in pages:
+            blob.extend(page)
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(path + ".tmp", "wb") as f:
+                f.write(blob)
+            os.replace(path + ".tmp", path)
+        except OSError:
+            pass
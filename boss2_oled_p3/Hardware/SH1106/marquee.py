@@ -0,0 +1,90 @@
+"""
+Hardware scrolled marquee for text that does not fit on one line.
+
+The SH1106 has no hidden Display Data RAM rows and only four spare columns,
+so the text cannot be scrolled horizontally in hardware.  Instead it is
+wrapped into lines that are stacked in the RAM once, and the display start
+line is stepped to scroll them up through the panel.  Each step costs a
+single command byte.
+
+The multiplex ratio is lowered so that only the top VISIBLE_PIXELS rows of
+the panel are driven, hiding one line of the RAM.  The RAM is circular, so
+a line that has scrolled out at the top is in the hidden band, where it is
+replaced by the next line of text before it re-enters at the bottom.  That
+is the only time display data is written.
+
+    marquee = lcd.marquee("PCM 44.1kHz 24bit, phase compensation enabled")
+    for _ in range(200):
+        marquee.step()
+        time.sleep(0.05)
+    marquee.stop()
+"""
+from .SH1106LCD import COLUMN_OFFSET, HEIGHT_PIXELS, PIXELS_PER_ROW, WIDTH_PIXELS
+
+LINE_WIDTH_PIXELS = WIDTH_PIXELS - 2 * COLUMN_OFFSET
+# Rows (pages) taken by one line of text
+LINE_ROWS = 2
+LINE_PIXELS = LINE_ROWS * PIXELS_PER_ROW
+LINE_SLOTS = HEIGHT_PIXELS // LINE_PIXELS
+# Panel rows shown while scrolling, all but one line of the RAM
+VISIBLE_PIXELS = HEIGHT_PIXELS - LINE_PIXELS
+
+
+class Marquee:
+    """Scrolls text through the top of the display, one pixel row per
+    step().  The marquee takes over the display until stop() is called.
+
+        lcd - SH1106LCD to draw on
+        text - The text to scroll
+    """
+
+    def __init__(self, lcd, text):
+        self.lcd = lcd
+        self._lines = self._wrap(text)
+        # Blank line separating the end of the text from its start
+        self._lines.append("")
+        self._startLine = 0
+        self._nextLine = 0
+        lcd.setStartLine(0)
+        lcd.setMultiplexRatio(VISIBLE_PIXELS)
+        with lcd.frame():
+            for slot in range(LINE_SLOTS):
+                self._fillSlot(slot)
+
+    def _wrap(self, text):
+        """Splits text into the longest lines fitting the panel width."""
+        lines = []
+        line = ""
+        for char in text:
+            if line and self.lcd.textWidth(line + char) > LINE_WIDTH_PIXELS:
+                lines.append(line)
+                line = ""
+            line += char
+        if line:
+            lines.append(line)
+        return lines
+
+    def _fillSlot(self, slot):
+        line = self._lines[self._nextLine % len(self._lines)]
+        self._nextLine += 1
+        row = slot * LINE_ROWS
+        with self.lcd.frame():
+            self.lcd.clear_region(range(row, row + LINE_ROWS))
+            self.lcd.displayString(line, row, 0)
+
+    def step(self):
+        """Scrolls the text up by one pixel row."""
+        self._startLine = (self._startLine + 1) % HEIGHT_PIXELS
+        self.lcd.setStartLine(self._startLine)
+        if self._startLine % LINE_PIXELS == 0:
+            # The line that just left the top is now in the hidden band
+            slot = (self._startLine // LINE_PIXELS - 1) % LINE_SLOTS
+            self._fillSlot(slot)
+
+    def stop(self):
+        """Restores the display start line and multiplex ratio and clears the
+        display.
+        """
+        self.lcd.setStartLine(0)
+        self.lcd.setMultiplexRatio(HEIGHT_PIXELS)
+        self.lcd.clearScreen()
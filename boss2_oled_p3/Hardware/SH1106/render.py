@@ -0,0 +1,115 @@
+"""
+Compiles framebuffer changes into the spans written to the SH1106.
+
+Every span of a page that is written costs a cursor move on top of its data,
+so two nearby runs of changed columns are often cheaper to send as a single
+span, resending the unchanged columns between them from the framebuffer.
+The cost of a span is modeled as the number of bits it puts on the wire with
+a given transport, and the changed runs of each page are grouped into the
+spans with the lowest total cost.
+
+With TRANSPORT_I2C_RDWR a span is a cursor command message followed by a
+data message:
+
+    | S | addr | 0x00 | page | upper col | lower col |
+    | S | addr | 0x40 | data ... |
+
+With TRANSPORT_SMBUS a span is one block write chaining the cursor commands
+and the first data bytes with Co=1 control bytes, followed by as many data
+block writes as needed:
+
+    | S | addr | 0x80 | page | 0x80 | upper col | 0x80 | lower col | 0x40 | data ... | P |
+    | S | addr | 0x40 | data ... | P |
+"""
+# Bits on the wire: a start (or repeated start) condition, the address byte
+# and every data byte each followed by an acknowledge bit, and a stop.
+START_BITS = 1
+STOP_BITS = 1
+BITS_PER_BYTE = 9
+
+# Page and column commands moving the SH1106 RAM write pointer
+CURSOR_COMMANDS = 3
+
+
+def message_bits(nbytes):
+    """Returns the bits taken by an I2C message of nbytes bytes, including
+    its start condition and address byte.
+    """
+    return START_BITS + BITS_PER_BYTE * (1 + nbytes)
+
+
+def rdwr_span_cost(length, cursor_commands=CURSOR_COMMANDS):
+    """Returns the bits taken by a span of length bytes sent as a cursor
+    message and a data message of an I2C_RDWR transaction.
+    """
+    return message_bits(1 + cursor_commands) + message_bits(1 + length)
+
+
+def smbus_span_cost(length, block_length, cursor_commands=CURSOR_COMMANDS):
+    """Returns the bits taken by a span of length bytes sent as SMBus block
+    writes of up to block_length data bytes, not counting the register byte.
+    The first block also carries the cursor commands, each followed by a
+    control byte.
+    """
+    header = 2 * cursor_commands
+    first = min(length, block_length - header)
+    bits = message_bits(1 + header + first) + STOP_BITS
+    for i in range(first, length, block_length):
+        chunk = min(block_length, length - i)
+        bits += message_bits(1 + chunk) + STOP_BITS
+    return bits
+
+
+def changed_runs(wanted, sent, start, end):
+    """Returns the (start, end) column runs within [start, end) where wanted
+    and sent differ, each as long as possible.
+    """
+    runs = []
+    run_start = None
+    for col in range(start, end):
+        if wanted[col] == sent[col]:
+            if run_start is not None:
+                runs.append((run_start, col))
+                run_start = None
+        elif run_start is None:
+            run_start = col
+    if run_start is not None:
+        runs.append((run_start, end))
+    return runs
+
+
+def compile_spans(wanted, sent, start, end, span_cost):
+    """Returns the (start, end) column spans to send so that sent matches
+    wanted within [start, end), at the lowest total span_cost.
+
+    wanted - Page bytes wanted on the panel
+    sent - Page bytes currently on the panel
+    span_cost - Function returning the cost of sending a span of a given
+                length, such as rdwr_span_cost
+    """
+    runs = changed_runs(wanted, sent, start, end)
+    if len(runs) <= 1:
+        return runs
+    # best[i] is the lowest cost of sending the first i runs, and first[i]
+    # the index of the first run in the last span of that solution.
+    best = [0]
+    first = [0]
+    for i in range(1, len(runs) + 1):
+        span_end = runs[i - 1][1]
+        best_cost = None
+        best_first = None
+        for j in range(i - 1, -1, -1):
+            cost = best[j] + span_cost(span_end - runs[j][0])
+            if best_cost is None or cost < best_cost:
+                best_cost = cost
+                best_first = j
+        best.append(best_cost)
+        first.append(best_first)
+    spans = []
+    i = len(runs)
+    while i > 0:
+        j = first[i]
+        spans.append((runs[j][0], runs[i - 1][1]))
+        i = j
+    spans.reverse()
+    return spans
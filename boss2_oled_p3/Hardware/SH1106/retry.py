@@ -0,0 +1,109 @@
+"""
+Retry policy and circuit breaker for the SH1106 I2C transport.
+
+A failed transaction is retried with an exponentially growing delay, so that
+a disturbed bus gets time to recover instead of being hammered in a tight
+loop.  Once several transactions in a row have been given up on, the circuit
+breaker opens and no further transactions are attempted until reset_timeout
+has passed.  The next transaction is then let through as a probe: if it
+succeeds the circuit closes again, otherwise it stays open for another
+reset_timeout.
+
+    | CLOSED | --failure_threshold failures--> | OPEN |
+    | OPEN | --reset_timeout--> | HALF_OPEN |
+    | HALF_OPEN | --success--> | CLOSED |, --failure--> | OPEN |
+"""
+import threading
+import time
+
+CIRCUIT_CLOSED = "closed"
+CIRCUIT_OPEN = "open"
+CIRCUIT_HALF_OPEN = "half_open"
+
+
+class BusUnavailableError(IOError):
+    """Returned for transactions that were not attempted because the
+    circuit breaker is open.
+    """
+
+
+class RetryPolicy:
+    """How often and how patiently to retry a failed I2C transaction, and
+    when to stop trying altogether.
+
+    attempts - Number of attempts made for each transaction
+    base_delay - Delay before the first retry, in seconds
+    max_delay - Upper limit of the delay between two attempts, in seconds
+    failure_threshold - Number of consecutive failed transactions opening
+                        the circuit breaker
+    reset_timeout - Time the circuit stays open before a probe transaction
+                    is let through, in seconds
+    """
+
+    def __init__(
+        self,
+        attempts=5,
+        base_delay=0.0005,
+        max_delay=0.02,
+        failure_threshold=3,
+        reset_timeout=5.0,
+    ):
+        if attempts < 1:
+            raise ValueError("attempts must be at least 1")
+        self.attempts = attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+
+    def delay(self, retry):
+        """Returns the time to wait before retry number retry (0 based)."""
+        return min(self.max_delay, self.base_delay * (2**retry))
+
+
+class CircuitBreaker:
+    """Tracks consecutive transaction failures as described by a
+    RetryPolicy.
+    """
+
+    def __init__(self, policy):
+        self.policy = policy
+        self._lock = threading.Lock()
+        self.state = CIRCUIT_CLOSED
+        self._failures = 0
+        self._openedAt = 0.0
+
+    def allow(self):
+        """Returns True if a transaction may be attempted now."""
+        with self._lock:
+            if self.state == CIRCUIT_OPEN:
+                if time.monotonic() - self._openedAt < self.policy.reset_timeout:
+                    return False
+                self.state = CIRCUIT_HALF_OPEN
+            return True
+
+    def success(self):
+        """Records a transaction that went through, closing the circuit.
+        Returns True if the circuit was not closed before.
+        """
+        with self._lock:
+            recovered = self.state != CIRCUIT_CLOSED
+            self.state = CIRCUIT_CLOSED
+            self._failures = 0
+            return recovered
+
+    def failure(self):
+        """Records a transaction that was given up on.  Returns True if this
+        opened a closed circuit.
+        """
+        with self._lock:
+            self._failures += 1
+            if (
+                self.state == CIRCUIT_HALF_OPEN
+                or self._failures >= self.policy.failure_threshold
+            ):
+                opened = self.state == CIRCUIT_CLOSED
+                self.state = CIRCUIT_OPEN
+                self._openedAt = time.monotonic()
+                return opened
+            return False
@@ -0,0 +1,104 @@
+"""
+Emulated panels showing what the display driver draws, without hardware.
+
+The sinks are FakeSMBus buses: passed to SH1106LCD or SSD1306LCD as their
+bus, they decode the controller commands like the emulator does and count
+the transfers.  Whenever a transaction changes what the panel shows:
+
+- FileSink writes the panel to an image file, a binary PGM or, for a .png
+  file name, a PNG written with Pillow
+- TerminalSink draws the panel on an ANSI terminal, two pixel rows per line
+  of half block characters, followed by the transfer counters
+"""
+import logging
+import os
+import sys
+
+from .emulator import FAST_MODE_HZ, PANEL_HEIGHT, PANEL_WIDTH, FakeSMBus
+
+logger = logging.getLogger(__name__)
+
+# Characters for the (top, bottom) pixel pairs 00, 10, 01 and 11
+HALF_BLOCKS = (" ", "▀", "▄", "█")
+
+
+class PanelSink(FakeSMBus):
+    """FakeSMBus calling show() with the panel pixels, as returned by
+    FakeSMBus.panel, after every transaction changing them.
+
+    first_column - RAM column shown at the left edge of the panel
+    width - Number of columns shown
+    """
+
+    def __init__(self, first_column=0, width=PANEL_WIDTH):
+        super().__init__()
+        self.first_column = first_column
+        self.width = width
+        self._shown = None
+
+    def _transaction(self, i2c_addr, payloads):
+        super()._transaction(i2c_addr, payloads)
+        rows = self.panel(self.first_column, self.width)
+        if rows != self._shown:
+            self._shown = rows
+            self.show(rows)
+
+    def show(self, rows):
+        raise NotImplementedError
+
+
+class FileSink(PanelSink):
+    """Writes the panel to filename, replacing the file on every change."""
+
+    def __init__(self, filename, first_column=0, width=PANEL_WIDTH):
+        super().__init__(first_column, width)
+        self.filename = filename
+        self.png = filename.lower().endswith(".png")
+
+    def show(self, rows):
+        data = b"".join(bytes(255 * pixel for pixel in row) for row in rows)
+        tmp = self.filename + ".tmp"
+        try:
+            if self.png:
+                from PIL import Image
+
+                Image.frombytes("L", (self.width, PANEL_HEIGHT), data).save(tmp, "PNG")
+            else:
+                with open(tmp, "wb") as f:
+                    f.write(
+                        "P5\n{} {}\n255\n".format(self.width, PANEL_HEIGHT).encode()
+                    )
+                    f.write(data)
+            os.replace(tmp, self.filename)
+        except OSError as err:
+            logger.warning("Unable to write {}: {}".format(self.filename, err))
+
+
+class TerminalSink(PanelSink):
+    """Draws the panel at the top left of an ANSI terminal."""
+
+    def __init__(self, first_column=0, width=PANEL_WIDTH, stream=None):
+        super().__init__(first_column, width)
+        self.stream = stream if stream is not None else sys.stdout
+        self._cleared = False
+
+    def show(self, rows):
+        lines = []
+        for y in range(0, len(rows), 2):
+            top = rows[y]
+            bottom = rows[y + 1]
+            lines.append(
+                "".join(HALF_BLOCKS[t + 2 * b] for t, b in zip(top, bottom)) + "|"
+            )
+        lines.append("-" * self.width + "+")
+        lines.append(
+            "{} transactions, {} bytes, {:.1f}ms on the bus at 400kHz\x1b[K".format(
+                self.transactions, self.bytes, self.bus_time(FAST_MODE_HZ) * 1000
+            )
+        )
+        prefix = "\x1b[H"
+        if not self._cleared:
+            prefix = "\x1b[2J" + prefix
+            self._cleared = True
+        self.stream.write(prefix + "\n".join(lines) + "\n")
+        self.stream.flush()
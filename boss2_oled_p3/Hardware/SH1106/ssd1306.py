@@ -0,0 +1,112 @@
+"""
+Driver for SSD1306 based 128x64 OLED displays.
+
+The SSD1306 is drawn on exactly like the SH1106, but runs in horizontal
+addressing mode: the RAM write pointer moves through a window of columns and
+pages, wrapping to the start of the next page at the end of each one.  Any
+rectangle of the display, up to a whole frame, can then be sent as a single
+data stream after one window command.
+"""
+from .SH1106LCD import DEFAULT_CONTRAST, ROWS, SH1106LCD
+
+RAM_COLUMNS = 128
+
+
+class SSD1306LCD(SH1106LCD):
+    """Interface to an SSD1306 display, see SH1106LCD.  The 128 RAM columns
+    are all visible, so no column offset is applied.
+    """
+
+    RAM_COLUMNS = RAM_COLUMNS
+    COLUMN_OFFSET = 0
+
+    SET_MEMORY_ADDRESSING_MODE = 0x20
+    SET_COLUMN_ADDRESS = 0x21
+    SET_PAGE_ADDRESS = 0x22
+    SET_CHARGE_PUMP = 0x8D
+
+    HORIZONTAL_ADDRESSING = 0x00
+    CHARGE_PUMP_ON = 0x14
+
+    def _setupCommands(self):
+        """Returns the commands configuring the panel in horizontal
+        addressing mode, leaving the display off.  The orientation matches
+        the SH1106 setup.
+        """
+        return [
+            self.SET_DISPLAY_OFF,
+            self.SET_DIVIDE_RATIO_OSC_FREQ_MODE,
+            0x80,  # reset value
+            self.SET_MULTIPLEX_RATIO_MODE,
+            0x3F,  # 64 rows
+            self.SET_DISPLAY_OFFSET_MODE,
+            0x00,
+            self.SET_DISPLAY_START_LINE,
+            self.SET_CHARGE_PUMP,
+            self.CHARGE_PUMP_ON,
+            self.SET_MEMORY_ADDRESSING_MODE,
+            self.HORIZONTAL_ADDRESSING,
+            self.SET_SEGMENT_REMAP_RIGHT,
+            self.SET_COMMON_OUTPUT_SCAN_DIR,
+            self.SET_COMMON_PADS_HARDWARE_CONFIG,
+            0x12,  # alternative COM pin configuration
+            self.SET_CONTRAST_CONTROL_MODE,
+            DEFAULT_CONTRAST,
+            self.SET_PRECHARGE_PERIOD_MODE,
+            0xF1,  # as recommended with the internal charge pump
+            self.SET_VCOM_DESELECT_LEVEL_MODE,
+            0x40,
+            self.SET_ENTIRE_DISPLAY_OFF,
+            self.SET_REVERSE_OFF,
+        ]
+
+    def _positionCommands(self, row, col):
+        """Returns the commands opening a write window from the given page
+        and RAM column to the end of the RAM.
+        """
+        return self.__windowCommands(row, ROWS - 1, col, self.RAM_COLUMNS - 1)
+
+    def __windowCommands(self, first_row, last_row, first_col, last_col):
+        return [
+            self.SET_COLUMN_ADDRESS,
+            first_col,
+            last_col,
+            self.SET_PAGE_ADDRESS,
+            first_row,
+            last_row,
+        ]
+
+    def _writeSpans(self, spans):
+        """spans - List of (row, RAM column, data) to write to the panel.
+
+        Sends the rectangle bounding all spans as one window and data
+        stream, filled in from the framebuffer, unless sending the spans one
+        by one costs less.
+        """
+        if len(spans) < 2:
+            super()._writeSpans(spans)
+            return
+        first_row = min(row for row, _, _ in spans)
+        last_row = max(row for row, _, _ in spans)
+        first_col = min(col for _, col, _ in spans)
+        end_col = max(col + len(data) for _, col, data in spans)
+        span_cost = self._spanCost()
+        separate = sum(span_cost(len(data)) for _, _, data in spans)
+        rectangle = (last_row + 1 - first_row) * (end_col - first_col)
+        if span_cost(rectangle) >= separate:
+            super()._writeSpans(spans)
+            return
+        data = bytearray()
+        with self._fbLock:
+            for row in range(first_row, last_row + 1):
+                wanted = self._framebuffer[row][first_col:end_col]
+                self._panel[row][first_col:end_col] = wanted
+                data.extend(wanted)
+        self._writeBlocks(
+            [
+                (
+                    self.__windowCommands(first_row, last_row, first_col, end_col - 1),
+                    bytes(data),
+                )
+            ]
+        )
@@ -0,0 +1,100 @@
+"""
+I2C transaction counters and latency histograms for the SH1106 driver.
+"""
+import threading
+
+KIND_COMMAND = "command"
+KIND_DATA = "data"
+
+# Upper bounds of the latency histogram buckets, in milliseconds.  Slower
+# transactions are counted in a final "inf" bucket.
+LATENCY_BUCKETS_MS = (0.25, 0.5, 1, 2, 5, 10, 20, 50, 100)
+
+
+class TransferStats:
+    """Counters for one kind of transfer."""
+
+    def __init__(self):
+        self.transactions = 0
+        self.bytes = 0
+        self.retries = 0
+        self.failures = 0
+        self.dropped = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+        self.histogram = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+
+    def record(self, nbytes, latency, retries, failed):
+        self.transactions += 1
+        self.bytes += nbytes
+        self.retries += retries
+        if failed:
+            self.failures += 1
+        self.latency_total += latency
+        self.latency_max = max(self.latency_max, latency)
+        latency_ms = latency * 1000
+        for i, bound in enumerate(LATENCY_BUCKETS_MS):
+            if latency_ms <= bound:
+                self.histogram[i] += 1
+                break
+        else:
+            self.histogram[-1] += 1
+
+    def drop(self):
+        self.dropped += 1
+
+    def snapshot(self):
+        labels = ["<={}ms".format(bound) for bound in LATENCY_BUCKETS_MS] + ["inf"]
+        return {
+            "transactions": self.transactions,
+            "bytes": self.bytes,
+            "retries": self.retries,
+            "failures": self.failures,
+            "dropped": self.dropped,
+            "latency_avg_ms": (
+                self.latency_total * 1000 / self.transactions
+                if self.transactions
+                else 0.0
+            ),
+            "latency_max_ms": self.latency_max * 1000,
+            "latency_histogram": dict(zip(labels, self.histogram)),
+        }
+
+
+class TransportStats:
+    """Thread-safe transfer statistics, broken down by KIND_COMMAND and
+    KIND_DATA.  A transaction is one call to the bus, including all of its
+    retries; its latency covers all attempts.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._kinds = {KIND_COMMAND: TransferStats(), KIND_DATA: TransferStats()}
+
+    def record(self, kind, nbytes, latency, retries=0, failed=False):
+        """Counts one transaction.
+
+        kind - KIND_COMMAND or KIND_DATA
+        nbytes - Number of bytes written, including control bytes
+        latency - Time taken, in seconds
+        retries - Number of attempts that failed before the last one
+        failed - True if the transaction was given up on
+        """
+        with self._lock:
+            self._kinds[kind].record(nbytes, latency, retries, failed)
+
+    def drop(self, kind):
+        """Counts one transaction that was not attempted because the bus is
+        considered unavailable.
+        """
+        with self._lock:
+            self._kinds[kind].drop()
+
+    def snapshot(self):
+        """Returns a dict of the counters of each kind of transfer."""
+        with self._lock:
+            return {kind: stats.snapshot() for kind, stats in self._kinds.items()}
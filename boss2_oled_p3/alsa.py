@@ -1,14 +1,340 @@
+from collections import namedtuple
+import logging
+import os
+import re
+import subprocess
+import threading
 from types import SimpleNamespace
 
+import alsa_ctl
+from amixer_session import AmixerSession
 from utils import shell_cmd
 
+logger = logging.getLogger(__name__)
+
+# Element of a change event printed by "alsactl monitor", e.g.
+# node hw:0, #3 (2,0,0,Master Playback Volume,0) VALUE
+ALSACTL_EVENT = re.compile(r"#\d+ \(\d+,\d+,\d+,(.*),\d+\)")
+
+# Lines of "amixer contents" output, e.g.
+# numid=3,iface=MIXER,name='Master Playback Volume'
+#   ; type=INTEGER,access=rw---R--,values=2,min=0,max=255,step=0
+#   : values=200,200
+AMIXER_ELEMENT = re.compile(r"^numid=\d+,iface=(\w+),name='(.*)'(.*)$")
+AMIXER_TYPE = re.compile(r"^\s+; type=(\w+),")
+AMIXER_ITEM = re.compile(r"^\s+; Item #\d+ '(.*)'")
+AMIXER_VALUES = re.compile(r"^\s+: values=(.*)$")
+AMIXER_TYPES = {
+    "BOOLEAN": alsa_ctl.ELEM_TYPE_BOOLEAN,
+    "INTEGER": alsa_ctl.ELEM_TYPE_INTEGER,
+    "ENUMERATED": alsa_ctl.ELEM_TYPE_ENUMERATED,
+}
+
+HW_PARAMS_PATH = "/proc/asound/card{}/pcm0p/sub0/hw_params"
+# Lines of the hw_params file of an open stream, e.g.
+# format: S24_LE
+# rate: 44100 (44100/1)
+HW_PARAMS_FORMAT = re.compile(rb"^format:\s*(\S+)", re.MULTILINE)
+HW_PARAMS_RATE = re.compile(rb"^rate:\s*(\d+)", re.MULTILINE)
+HW_PARAMS_SIZE = 4096
+
+# Failed batches in a row after which the amixer session is given up
+AMIXER_SESSION_FAILURES = 3
+
+# Sample format and rate of the stream, as returned by getHwparam: format
+# is "closed" and rate "" while no stream is open
+HwParams = namedtuple("HwParams", ["format", "rate"])
+
+# State of the Boss2 controls: switches are 1 when on, as returned by
+# getMuteStatus, and fil_sp is 1 for the fast filter, as returned by
+# getFilterStatus
+MixerState = namedtuple(
+    "MixerState",
+    [
+        "volume",
+        "digital_volume",
+        "mute",
+        "hp_fil",
+        "hv_en",
+        "non_os",
+        "ph_comp",
+        "de_emp",
+        "fil_sp",
+    ],
+)
+
+
+def parse_contents(out):
+    """Returns the mixer elements listed by "amixer contents", as a dict of
+    element name: (ELEM_TYPE_*, values, item names).  Enumerated values are
+    item indexes, and switches 1 when on.
+    """
+    elements = {}
+    name = None
+    for line in out.splitlines():
+        match = AMIXER_ELEMENT.match(line)
+        if match:
+            iface, name, rest = match.groups()
+            if iface != "MIXER" or "index=" in rest and "index=0" not in rest:
+                name = None
+            else:
+                elements[name] = (None, [], [])
+            continue
+        if name is None:
+            continue
+        type_, values, items = elements[name]
+        match = AMIXER_TYPE.match(line)
+        if match:
+            elements[name] = (AMIXER_TYPES.get(match.group(1)), values, items)
+            continue
+        match = AMIXER_ITEM.match(line)
+        if match:
+            items.append(match.group(1))
+            continue
+        match = AMIXER_VALUES.match(line)
+        if match:
+            for value in match.group(1).split(","):
+                if value in ("on", "off"):
+                    values.append(int(value == "on"))
+                else:
+                    try:
+                        values.append(int(value))
+                    except ValueError:
+                        pass
+    return {
+        name: (type_, values, tuple(items))
+        for name, (type_, values, items) in elements.items()
+    }
+
+
+class HwParamsReader:
+    """Reads a hw_params file of procfs, kept open between reads.
+
+    Each read is a single pread of the file, and returns the same HwParams
+    as the previous one while the file content does not change.  The file
+    is opened again after an error.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._fd = None
+        self._data = None
+        self._params = HwParams("", "")
+        self._failed = False
+
+    def read(self):
+        """Returns the HwParams in the file, or HwParams("", "") if it cannot
+        be read.
+        """
+        for _ in range(2):
+            try:
+                if self._fd is None:
+                    self._fd = os.open(self.path, os.O_RDONLY | os.O_CLOEXEC)
+                data = os.pread(self._fd, HW_PARAMS_SIZE, 0)
+                break
+            except OSError as err:
+                error = err
+                self.close()
+        else:
+            if not self._failed:
+                logger.warning("Unable to read {}: {}".format(self.path, error))
+                self._failed = True
+            return HwParams("", "")
+        self._failed = False
+        if data != self._data:
+            self._data = data
+            self._params = self.parse(data)
+        return self._params
+
+    def close(self):
+        if self._fd is not None:
+            try:
+                os.close(self._fd)
+            except OSError:
+                pass
+            self._fd = None
+        self._data = None
+
+    @staticmethod
+    def parse(data):
+        """Returns the HwParams of the content of a hw_params file."""
+        if data.startswith(b"closed"):
+            return HwParams("closed", "")
+        hw_format = HW_PARAMS_FORMAT.search(data)
+        hw_rate = HW_PARAMS_RATE.search(data)
+        return HwParams(
+            hw_format.group(1).decode() if hw_format else "",
+            int(hw_rate.group(1)) if hw_rate else "",
+        )
+
+
+def _element_name(elements, name, suffixes):
+    """Returns the name of the element implementing simple control name in
+    elements, as returned by parse_contents, or None.
+    """
+    for suffix in suffixes:
+        element = elements.get(name + suffix)
+        if element is not None and element[0] == alsa_ctl.SUFFIX_TYPES[suffixes]:
+            return name + suffix
+    return None
+
+
+def _find(elements, name, suffixes):
+    """Returns the (values, item names) of the element implementing simple
+    control name in elements, as returned by parse_contents, or None.
+    """
+    element_name = _element_name(elements, name, suffixes)
+    return None if element_name is None else elements[element_name][1:]
+
 
 class AlsaMixer:
+    """Mixer controls of a card, read and written through its control
+    device (see alsa_ctl) when it can be opened, or amixer otherwise.
+    Controls are set through an amixer session (see amixer_session), or an
+    amixer process per command if that fails.  The session is given up
+    after AMIXER_SESSION_FAILURES failed batches in a row.
+    """
+
     def __init__(self, card_num, card_name):
         self.card_num = card_num
         self.card_name = card_name
+        self.ctl = None
+        # The amixer session, None until started, False once given up
+        self.session = None
+        # Elements listed by "amixer contents", naming those the session sets
+        self._amixerElements = None
+        self.hwParams = None
+        if card_num is not None and card_num != -1:
+            self.ctl = alsa_ctl.open_card(card_num)
+
+    def _element(self, mixerCtrl, suffixes):
+        """Returns the control element implementing mixerCtrl, or None to
+        use amixer.
+        """
+        if self.ctl is None:
+            return None
+        return self.ctl.find(mixerCtrl, suffixes)
+
+    def _read(self, element):
+        """Returns the values of element, or None on failure."""
+        try:
+            return self.ctl.read(element)
+        except OSError as err:
+            self._ctlFailed(element, err)
+            return None
+
+    def _write(self, element, values):
+        """Sets the values of element, returning False on failure."""
+        try:
+            self.ctl.write(element, values)
+            return True
+        except OSError as err:
+            self._ctlFailed(element, err)
+            return False
+
+    def _ctlFailed(self, element, err):
+        """Stops using the control device, unless err only concerns
+        element.
+        """
+        if err.errno in alsa_ctl.ELEMENT_ERRNOS:
+            logger.warning(
+                "Unable to access control {}, using amixer: {}".format(
+                    element.name, err
+                )
+            )
+            return
+        logger.warning("Control device failed, falling back to amixer: {}".format(err))
+        self.ctl.close()
+        self.ctl = None
+
+    def _amixerSet(self, *commands):
+        """Sets controls in one round trip over the amixer session.
+
+        commands - (simple control name, *_SUFFIXES, value) triples, with
+                   the value of every channel as amixer takes it, e.g. "off",
+                   "200" or "Slow"
+        """
+        if self._amixerElements is None:
+            # Read once: an empty listing leaves every command to amixer set
+            out, _ = shell_cmd(["amixer", "-c", str(self.card_num), "contents"])
+            self._amixerElements = parse_contents(out)
+        elements = []
+        for mixerCtrl, suffixes, value in commands:
+            name = _element_name(self._amixerElements, mixerCtrl, suffixes)
+            if name is None:
+                break
+            channels = max(1, len(self._amixerElements[name][1]))
+            elements.append((name, ",".join([value] * channels)))
+        else:
+            session = self._amixerSession()
+            replies = None
+            try:
+                if session is not None:
+                    replies = session.run(elements)
+            except OSError as err:
+                logger.warning("amixer session failed: {}".format(err))
+                if session.failures >= AMIXER_SESSION_FAILURES:
+                    logger.warning("Giving up the amixer session")
+                    session.close()
+                    self.session = False
+            if replies is not None:
+                # amixer prints nothing about an element it failed to set
+                commands = [
+                    command
+                    for command, reply in zip(commands, replies)
+                    if reply is None
+                ]
+                if not commands:
+                    return
+                logger.warning(
+                    "amixer session did not set {}, retrying".format(
+                        ", ".join(mixerCtrl for mixerCtrl, _, _ in commands)
+                    )
+                )
+        for mixerCtrl, _, value in commands:
+            shell_cmd(["amixer", "-c", str(self.card_num), "set", mixerCtrl, value])
+
+    def _amixerSession(self):
+        """Returns the amixer session, or None once it is given up or if
+        sessions cannot be run.
+        """
+        if self.session is None:
+            if AmixerSession.available():
+                self.session = AmixerSession(self.card_num, self.CONTROL.MA_CTRL)
+            else:
+                logger.warning("stdbuf not found, not using an amixer session")
+                self.session = False
+        return self.session or None
+
+    def _contents(self, controls):
+        """Returns the mixer elements implementing controls, a list of
+        (simple control name, *_SUFFIXES) pairs, as returned by
+        parse_contents.  They are read from the control device, or all the
+        elements of the card from a single amixer call if any of them
+        cannot be read.
+        """
+        elements = {}
+        for mixerCtrl, suffixes in controls:
+            element = self._element(mixerCtrl, suffixes)
+            if element is None:
+                continue
+            values = self._read(element)
+            if values is None:
+                break
+            elements[element.name] = (element.type, values, element.items)
+        else:
+            if self.ctl is not None:
+                return elements
+        out, stderr = shell_cmd(["amixer", "-c", str(self.card_num), "contents"])
+        if stderr:
+            logger.warning("Error getting mixer contents: {}".format(stderr))
+        return parse_contents(out)
 
     def getMuteStatus(self, mixerCtrl):
+        switch = self._element(mixerCtrl, alsa_ctl.SWITCH_SUFFIXES)
+        values = switch and self._read(switch)
+        if values:
+            return 0 if 0 in values else 1
         cmd = ["amixer", "-c", str(self.card_num), "get", "'{}'".format(mixerCtrl)]
         out, _ = shell_cmd(cmd)
         if "off" in out:
@@ -17,13 +343,23 @@ class AlsaMixer:
             return 1
 
     def setMuteStatus(self, mixerCtrl, update_M):
+        switch = self._element(mixerCtrl, alsa_ctl.SWITCH_SUFFIXES)
+        if switch and self._write(switch, [int(update_M != 0)] * switch.count):
+            return
         if update_M == 0:
-            shell_cmd(["amixer", "-c", self.card_num, "set", mixerCtrl, "mute"])
+            self._amixerSet((mixerCtrl, alsa_ctl.SWITCH_SUFFIXES, "off"))
         else:
-            shell_cmd(["amixer", "-c", self.card_num, "set", mixerCtrl, "unmute"])
+            self._amixerSet((mixerCtrl, alsa_ctl.SWITCH_SUFFIXES, "on"))
 
     def getVol(self):
         MIXER_CONTROL = self.CONTROL.MA_CTRL
+        volume = self._element(MIXER_CONTROL, alsa_ctl.VOLUME_SUFFIXES)
+        if volume and volume.tlv is not None:
+            values = self._read(volume)
+            if values:
+                left_db, right_db = volume.to_db(values[0]), volume.to_db(values[-1])
+                if left_db is not None and right_db is not None:
+                    return values[0], left_db, right_db
         left_db_str = "[-127.50dB]"
         right_db_str = "[-127.50dB]"
         left_hrdware_val = 0
@@ -55,60 +391,45 @@ class AlsaMixer:
         return alsa_cvol, left_db_float, right_db_float
 
     def setVol(self, alsa_hvol):
-        CARD_NUMBER = self.card_num
+        """Sets the Master and Digital volumes to alsa_hvol.
+
+        Returns 1 if alsa_hvol is out of range, or already the Master volume
+        read from the control device, and 0 otherwise.  Through amixer the
+        current volume is not read, so 0 does not mean that it changed.
+        """
         MIXER_CONTROL = "Master"
         MIXER_CONTROL1 = "Digital"
 
-        alsa_cvol, _, _ = self.getVol()
         setflag = 0
-        if alsa_cvol == alsa_hvol:
-            setflag = 1
-        elif alsa_hvol < 0 or alsa_hvol > 255:
-            setflag = 1
-        else:
-            cmd = (
-                "amixer",
-                "-c",
-                CARD_NUMBER,
-                "set",
-                MIXER_CONTROL,
-                "{left},{right}".format(left=alsa_hvol, right=alsa_hvol),
-            )
-            cmd1 = (
-                "amixer",
-                "-c",
-                CARD_NUMBER,
-                "set",
-                MIXER_CONTROL1,
-                "{left},{right}".format(left=alsa_hvol, right=alsa_hvol),
-            )
-            shell_cmd(cmd)
-            shell_cmd(cmd1)
-
+        if alsa_hvol < 0 or alsa_hvol > 255:
+            return 1
+        volumes = [
+            self._element(control, alsa_ctl.VOLUME_SUFFIXES)
+            for control in (MIXER_CONTROL, MIXER_CONTROL1)
+        ]
+        if all(volumes):
+            values = self._read(volumes[0])
+            if values and values[0] == alsa_hvol:
+                return 1
+            if values and all(
+                self._write(volume, [alsa_hvol] * volume.count) for volume in volumes
+            ):
+                return setflag
+        # Both volumes in one round trip, without reading the current one:
+        # setting the same volume again changes nothing
+        value = str(alsa_hvol)
+        self._amixerSet(
+            (MIXER_CONTROL, alsa_ctl.VOLUME_SUFFIXES, value),
+            (MIXER_CONTROL1, alsa_ctl.VOLUME_SUFFIXES, value),
+        )
         return setflag
 
     def getHwparam(self):
-        hw_format = ""
-        hw_rate_num = ""
         if self.card_num == -1:
-            hw_format = "No " + self.card_name
-        else:
-            hw_cmd = "/proc/asound/card" + str(self.card_num) + "/pcm0p/sub0/hw_params"
-            stdout, _ = shell_cmd(["cat", hw_cmd])
-            hw_param_str = stdout.rstrip().splitlines()
-            if hw_param_str[0] == "closed":
-                hw_format = "closed"
-            else:
-                for line in hw_param_str:
-                    if line.startswith("format:"):
-                        format_val = line.split(":")
-                        hw_format = format_val[1].strip()
-                    if str(line).find("rate:") != -1:
-                        rate_val = line.split(":")
-                        hw_rate = rate_val[1].strip()
-                        hw_rate_line = hw_rate.split()
-                        hw_rate_num = int(hw_rate_line[0])
-        return hw_format, hw_rate_num
+            return HwParams("No " + self.card_name, "")
+        if self.hwParams is None:
+            self.hwParams = HwParamsReader(HW_PARAMS_PATH.format(self.card_num))
+        return self.hwParams.read()
 
 
 class AlsaMixerBoss2(AlsaMixer):
@@ -124,6 +445,10 @@ class AlsaMixerBoss2(AlsaMixer):
     )
 
     def getFilterStatus(self):
+        speed = self._element(self.CONTROL.SP_CTRL, alsa_ctl.ENUM_SUFFIXES)
+        values = speed and self._read(speed)
+        if values:
+            return 0 if speed.items[values[0]] == "Slow" else 1
         out, _ = shell_cmd(["amixer", "-c", self.card_num, "get", "'PCM Filter Speed'"])
         lines = [line for line in out.split("\n") if "Item0" in line]
         if not lines:
@@ -141,16 +466,218 @@ class AlsaMixerBoss2(AlsaMixer):
         else:
             val = "Fast"
 
-        cmd = ["amixer", "-c", self.card_num, "set", "'PCM Filter Speed'", val]
-        shell_cmd(cmd)
+        speed = self._element(self.CONTROL.SP_CTRL, alsa_ctl.ENUM_SUFFIXES)
+        if (
+            speed
+            and val in speed.items
+            and self._write(speed, [speed.items.index(val)] * speed.count)
+        ):
+            return
+
+        self._amixerSet((self.CONTROL.SP_CTRL, alsa_ctl.ENUM_SUFFIXES, val))
+
+    def snapshot(self):
+        """Returns the MixerState of all the controls, read in one pass."""
+        switches = (
+            self.CONTROL.MA_CTRL,
+            self.CONTROL.HP_CTRL,
+            self.CONTROL.HV_CTRL,
+            self.CONTROL.NON_CTRL,
+            self.CONTROL.PH_CTRL,
+            self.CONTROL.DE_CTRL,
+        )
+        elements = self._contents(
+            [(control, alsa_ctl.SWITCH_SUFFIXES) for control in switches]
+            + [
+                (self.CONTROL.MA_CTRL, alsa_ctl.VOLUME_SUFFIXES),
+                (self.CONTROL.DIG_CTRL, alsa_ctl.VOLUME_SUFFIXES),
+                (self.CONTROL.SP_CTRL, alsa_ctl.ENUM_SUFFIXES),
+            ]
+        )
+
+        def switch(mixerCtrl):
+            found = _find(elements, mixerCtrl, alsa_ctl.SWITCH_SUFFIXES)
+            return 0 if found and 0 in found[0] else 1
+
+        def volume(mixerCtrl):
+            found = _find(elements, mixerCtrl, alsa_ctl.VOLUME_SUFFIXES)
+            return found[0][0] if found and found[0] else 0
+
+        speed = _find(elements, self.CONTROL.SP_CTRL, alsa_ctl.ENUM_SUFFIXES)
+        fil_sp = 1
+        if speed:
+            values, items = speed
+            if values and values[0] < len(items) and items[values[0]] == "Slow":
+                fil_sp = 0
+
+        return MixerState(
+            volume=volume(self.CONTROL.MA_CTRL),
+            digital_volume=volume(self.CONTROL.DIG_CTRL),
+            mute=switch(self.CONTROL.MA_CTRL),
+            hp_fil=switch(self.CONTROL.HP_CTRL),
+            hv_en=switch(self.CONTROL.HV_CTRL),
+            non_os=switch(self.CONTROL.NON_CTRL),
+            ph_comp=switch(self.CONTROL.PH_CTRL),
+            de_emp=switch(self.CONTROL.DE_CTRL),
+            fil_sp=fil_sp,
+        )
 
     def update_status(self):
-        self.getMuteStatus(self.CONTROL.MA_CTRL)
-        hp_fil = self.getMuteStatus(self.CONTROL.HP_CTRL)
-        hv_en = self.getMuteStatus(self.CONTROL.HV_CTRL)
-        non_os = self.getMuteStatus(self.CONTROL.NON_CTRL)
-        ph_comp = self.getMuteStatus(self.CONTROL.PH_CTRL)
-        de_emp = self.getMuteStatus(self.CONTROL.DE_CTRL)
-        fil_sp = self.getFilterStatus()
-
-        return hp_fil, hv_en, non_os, ph_comp, de_emp, fil_sp
+        state = self.snapshot()
+        return (
+            state.hp_fil,
+            state.hv_en,
+            state.non_os,
+            state.ph_comp,
+            state.de_emp,
+            state.fil_sp,
+        )
+
+
+class MixerCache:
+    """Reads of an AlsaMixer, kept until the control they read changes.
+
+    Once started, a thread follows the change events of the card controls,
+    made by this or any other application, from the control device or
+    from an "alsactl monitor" process.  Each event drops the cached reads of
+    the control that changed and counts a change, which wait() lets the UI
+    sleep on.  Without events, every read goes to the mixer.
+    """
+
+    def __init__(self, mixer):
+        self.mixer = mixer
+        self.CONTROL = mixer.CONTROL
+        self.monitoring = False
+        # Number of control changes seen
+        self.version = 0
+        self._cache = {}
+        self._changed = threading.Condition()
+
+    def start(self):
+        """Starts following the control changes, returning False if they
+        cannot be followed.
+        """
+        events = self.__events()
+        if events is None:
+            return False
+        self.monitoring = True
+        thread = threading.Thread(
+            target=self.__follow, args=(events,), name="mixer-events", daemon=True
+        )
+        thread.start()
+        return True
+
+    def wait(self, version, timeout=None):
+        """Waits for at most timeout seconds until the change count differs
+        from version, and returns the change count.
+        """
+        with self._changed:
+            self._changed.wait_for(lambda: self.version != version, timeout)
+            return self.version
+
+    def getMuteStatus(self, mixerCtrl):
+        return self.__cached(mixerCtrl, self.mixer.getMuteStatus, mixerCtrl)
+
+    def setMuteStatus(self, mixerCtrl, update_M):
+        self.mixer.setMuteStatus(mixerCtrl, update_M)
+        self.__invalidate([mixerCtrl])
+
+    def getVol(self):
+        return self.__cached(self.CONTROL.MA_CTRL, self.mixer.getVol)
+
+    def setVol(self, alsa_hvol):
+        setflag = self.mixer.setVol(alsa_hvol)
+        self.__invalidate([self.CONTROL.MA_CTRL, self.CONTROL.DIG_CTRL])
+        return setflag
+
+    def getFilterStatus(self):
+        return self.__cached(self.CONTROL.SP_CTRL, self.mixer.getFilterStatus)
+
+    def setFilterStatus(self, filter_mod):
+        self.mixer.setFilterStatus(filter_mod)
+        self.__invalidate([self.CONTROL.SP_CTRL])
+
+    def getHwparam(self):
+        return self.mixer.getHwparam()
+
+    def snapshot(self):
+        return self.mixer.snapshot()
+
+    def update_status(self):
+        return self.mixer.update_status()
+
+    def __cached(self, control, read, *args):
+        key = (control, read.__name__) + args
+        with self._changed:
+            if key in self._cache:
+                return self._cache[key]
+            version = self.version
+        value = read(*args)
+        with self._changed:
+            # Unless a change came in while reading
+            if self.monitoring and self.version == version:
+                self._cache[key] = value
+        return value
+
+    def __invalidate(self, controls):
+        with self._changed:
+            for key in [key for key in self._cache if key[0] in controls]:
+                del self._cache[key]
+            self.version += 1
+            self._changed.notify_all()
+
+    def __events(self):
+        """Returns an iterator over the lists of the controls changed by
+        each event, or None.
+        """
+        ctl = alsa_ctl.open_card(self.mixer.card_num)
+        if ctl is not None:
+            try:
+                ctl.subscribe()
+                return self.__controlEvents(ctl)
+            except OSError as err:
+                logger.warning("Unable to subscribe to control events: {}".format(err))
+                ctl.close()
+        try:
+            proc = subprocess.Popen(
+                ["alsactl", "monitor", "hw:{}".format(self.mixer.card_num)],
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+                universal_newlines=True,
+            )
+        except OSError as err:
+            logger.warning("Unable to run alsactl monitor: {}".format(err))
+            return None
+        return self.__alsactlEvents(proc)
+
+    @staticmethod
+    def __controlEvents(ctl):
+        try:
+            while True:
+                yield [alsa_ctl.simple_name(name) for name, _ in ctl.read_events()]
+        finally:
+            ctl.close()
+
+    @staticmethod
+    def __alsactlEvents(proc):
+        try:
+            for line in proc.stdout:
+                match = ALSACTL_EVENT.search(line)
+                if match:
+                    yield [alsa_ctl.simple_name(match.group(1))]
+        finally:
+            proc.kill()
+            proc.wait()
+
+    def __follow(self, events):
+        try:
+            for controls in events:
+                self.__invalidate(controls)
+        except OSError as err:
+            logger.warning("Error reading control events: {}".format(err))
+        with self._changed:
+            self.monitoring = False
+            self._cache.clear()
+            self.version += 1
+            self._changed.notify_all()
+        logger.warning("No more control events, reading the mixer every time")
@@ -0,0 +1,482 @@
+"""
+Native access to the controls of an ALSA card through its control device,
+/dev/snd/controlC<card>, the way alsa-lib talks to the kernel.
+
+Reading or writing a control is one ioctl on a file descriptor opened once,
+instead of an amixer process per call.  The elements of the card are listed
+when the device is opened, and looked up by the simple control names amixer
+uses, such as "Master", with the element name suffixes alsa-lib strips:
+
+    ctl = open_card(0)
+    master = ctl.find("Master", VOLUME_SUFFIXES)
+    left, right = ctl.read(master)
+    left_db = master.to_db(left)
+
+Subscribed control devices report the changes of the elements, made by any
+application, as events:
+
+    ctl.subscribe()
+    for name, mask in ctl.read_events():
+        ...
+
+The ioctl numbers follow the asm-generic encoding used by ARM, ARM64 and
+x86 Linux.
+"""
+import ctypes
+import errno
+import fcntl
+import logging
+import math
+import os
+import struct
+
+logger = logging.getLogger(__name__)
+
+CONTROL_DEVICE = "/dev/snd/controlC{}"
+
+ELEM_ID_NAME_MAXLEN = 44
+
+ELEM_IFACE_MIXER = 2
+
+ELEM_TYPE_BOOLEAN = 1
+ELEM_TYPE_INTEGER = 2
+ELEM_TYPE_ENUMERATED = 3
+
+ELEM_ACCESS_TLV_READ = 1 << 4
+
+# Errors of an ioctl on a single element, such as an inactive, write-only or
+# protected control, which leave the control device usable
+ELEMENT_ERRNOS = (errno.EPERM, errno.EACCES, errno.EINVAL, errno.ENOENT, errno.EBUSY)
+
+# Element name suffixes of the simple controls amixer shows, by the type of
+# element implementing them
+SWITCH_SUFFIXES = (" Playback Switch", " Switch", "")
+VOLUME_SUFFIXES = (" Playback Volume", " Volume", "")
+ENUM_SUFFIXES = (" Playback Enum", " Enum", "")
+
+SUFFIX_TYPES = {
+    SWITCH_SUFFIXES: ELEM_TYPE_BOOLEAN,
+    VOLUME_SUFFIXES: ELEM_TYPE_INTEGER,
+    ENUM_SUFFIXES: ELEM_TYPE_ENUMERATED,
+}
+
+EVENT_ELEM = 0
+EVENT_MASK_VALUE = 1 << 0
+EVENT_MASK_INFO = 1 << 1
+EVENT_MASK_ADD = 1 << 2
+EVENT_MASK_TLV = 1 << 3
+EVENT_MASK_REMOVE = 0xFFFFFFFF
+# Events read at most at once
+EVENT_BATCH = 16
+
+# dB scale descriptions (TLV) of volume elements, values in 0.01dB
+TLVT_CONTAINER = 0
+TLVT_DB_SCALE = 1
+TLVT_DB_LINEAR = 2
+TLVT_DB_RANGE = 3
+TLVT_DB_MINMAX = 4
+TLVT_DB_MINMAX_MUTE = 5
+TLV_DB_SCALE_MUTE = 0x10000
+TLV_DB_GAIN_MUTE = -9999999
+TLV_MAX_WORDS = 256
+
+
+class ElemId(ctypes.Structure):
+    _fields_ = [
+        ("numid", ctypes.c_uint),
+        ("iface", ctypes.c_int),
+        ("device", ctypes.c_uint),
+        ("subdevice", ctypes.c_uint),
+        ("name", ctypes.c_char * ELEM_ID_NAME_MAXLEN),
+        ("index", ctypes.c_uint),
+    ]
+
+
+class ElemList(ctypes.Structure):
+    _fields_ = [
+        ("offset", ctypes.c_uint),
+        ("space", ctypes.c_uint),
+        ("used", ctypes.c_uint),
+        ("count", ctypes.c_uint),
+        ("pids", ctypes.POINTER(ElemId)),
+        ("reserved", ctypes.c_ubyte * 50),
+    ]
+
+
+class _InfoInteger(ctypes.Structure):
+    _fields_ = [
+        ("min", ctypes.c_long),
+        ("max", ctypes.c_long),
+        ("step", ctypes.c_long),
+    ]
+
+
+class _InfoInteger64(ctypes.Structure):
+    _fields_ = [
+        ("min", ctypes.c_longlong),
+        ("max", ctypes.c_longlong),
+        ("step", ctypes.c_longlong),
+    ]
+
+
+class _InfoEnumerated(ctypes.Structure):
+    _fields_ = [
+        ("items", ctypes.c_uint),
+        ("item", ctypes.c_uint),
+        ("name", ctypes.c_char * 64),
+        ("names_ptr", ctypes.c_uint64),
+        ("names_length", ctypes.c_uint),
+    ]
+
+
+class _InfoValue(ctypes.Union):
+    _fields_ = [
+        ("integer", _InfoInteger),
+        ("integer64", _InfoInteger64),
+        ("enumerated", _InfoEnumerated),
+        ("reserved", ctypes.c_ubyte * 128),
+    ]
+
+
+class ElemInfo(ctypes.Structure):
+    _fields_ = [
+        ("id", ElemId),
+        ("type", ctypes.c_int),
+        ("access", ctypes.c_uint),
+        ("count", ctypes.c_uint),
+        ("owner", ctypes.c_int),
+        ("value", _InfoValue),
+        ("reserved", ctypes.c_ubyte * 64),
+    ]
+
+
+class _ValueData(ctypes.Union):
+    _fields_ = [
+        ("integer", ctypes.c_long * 128),
+        ("integer64", ctypes.c_longlong * 64),
+        ("enumerated", ctypes.c_uint * 128),
+        ("bytes", ctypes.c_ubyte * 512),
+    ]
+
+
+class ElemValue(ctypes.Structure):
+    _fields_ = [
+        ("id", ElemId),
+        ("indirect", ctypes.c_uint),
+        ("value", _ValueData),
+        ("reserved", ctypes.c_ubyte * 128),
+    ]
+
+
+class _EventElem(ctypes.Structure):
+    _fields_ = [("mask", ctypes.c_uint), ("id", ElemId)]
+
+
+class _EventData(ctypes.Union):
+    _fields_ = [("elem", _EventElem), ("data8", ctypes.c_ubyte * 60)]
+
+
+class Event(ctypes.Structure):
+    _fields_ = [("type", ctypes.c_int), ("data", _EventData)]
+
+
+class Tlv(ctypes.Structure):
+    """struct snd_ctl_tlv, followed by room for TLV_MAX_WORDS words."""
+
+    _fields_ = [
+        ("numid", ctypes.c_uint),
+        ("length", ctypes.c_uint),
+        ("tlv", ctypes.c_uint * TLV_MAX_WORDS),
+    ]
+
+
+def _IOWR(nr, size):
+    return 3 << 30 | size << 16 | ord("U") << 8 | nr
+
+
+IOCTL_ELEM_LIST = _IOWR(0x10, ctypes.sizeof(ElemList))
+IOCTL_ELEM_INFO = _IOWR(0x11, ctypes.sizeof(ElemInfo))
+IOCTL_ELEM_READ = _IOWR(0x12, ctypes.sizeof(ElemValue))
+IOCTL_ELEM_WRITE = _IOWR(0x13, ctypes.sizeof(ElemValue))
+IOCTL_SUBSCRIBE_EVENTS = _IOWR(0x16, ctypes.sizeof(ctypes.c_int))
+# The header only, without the words following it
+IOCTL_TLV_READ = _IOWR(0x1A, 2 * ctypes.sizeof(ctypes.c_uint))
+
+
+def simple_name(name):
+    """Returns the name of the simple control, as amixer shows it, that
+    element name belongs to.
+    """
+    for suffix in SWITCH_SUFFIXES + VOLUME_SUFFIXES + ENUM_SUFFIXES:
+        if suffix and name.endswith(suffix):
+            return name[: -len(suffix)]
+    return name
+
+
+def _db_from_tlv(tlv, minimum, maximum, value):
+    """Returns the gain in 0.01dB of value, between minimum and maximum, as
+    described by the TLV words tlv, or None if they do not describe a dB
+    scale.  Follows snd_tlv_convert_to_dB of alsa-lib.
+    """
+    if len(tlv) < 2:
+        return None
+    kind, length = tlv[0], tlv[1] // 4
+    data = tlv[2 : 2 + length]
+    if kind == TLVT_CONTAINER:
+        while data:
+            db = _db_from_tlv(data, minimum, maximum, value)
+            if db is not None:
+                return db
+            data = data[2 + data[1] // 4 :]
+        return None
+    if kind == TLVT_DB_RANGE:
+        while len(data) >= 4:
+            range_min, range_max = data[0], data[1]
+            sub = data[2 : 4 + data[3] // 4]
+            if range_min <= value <= range_max:
+                return _db_from_tlv(sub, range_min, range_max, value)
+            data = data[4 + data[3] // 4 :]
+        return None
+    if len(data) < 2:
+        return None
+    low = struct.unpack("i", struct.pack("I", data[0]))[0]
+    if kind == TLVT_DB_SCALE:
+        step = data[1] & 0xFFFF
+        if data[1] & TLV_DB_SCALE_MUTE and value <= minimum:
+            return TLV_DB_GAIN_MUTE
+        return low + step * (value - minimum)
+    high = struct.unpack("i", struct.pack("I", data[1]))[0]
+    if kind in (TLVT_DB_MINMAX, TLVT_DB_MINMAX_MUTE):
+        if kind == TLVT_DB_MINMAX_MUTE and value <= minimum:
+            return TLV_DB_GAIN_MUTE
+        if maximum <= minimum:
+            return low
+        return low + (high - low) * (value - minimum) // (maximum - minimum)
+    if kind == TLVT_DB_LINEAR:
+        if value <= minimum:
+            return low
+        if value >= maximum:
+            return high
+        low_gain = 10 ** (low / 2000.0) if low > TLV_DB_GAIN_MUTE else 0.0
+        high_gain = 10 ** (high / 2000.0)
+        gain = low_gain + (high_gain - low_gain) * (value - minimum) / (
+            maximum - minimum
+        )
+        return int(2000 * math.log10(gain)) if gain > 0 else TLV_DB_GAIN_MUTE
+    return None
+
+
+class Element:
+    """A control element of the card.
+
+    numid - Number identifying the element in ioctls
+    iface - Interface of the element, ELEM_IFACE_MIXER for mixer controls
+    name - Element name, e.g. "Master Playback Volume"
+    index - Index of the element among those of the same name
+    type - ELEM_TYPE_BOOLEAN, ELEM_TYPE_INTEGER, ELEM_TYPE_ENUMERATED...
+    count - Number of values (channels)
+    minimum, maximum - Range of integer values
+    items - Names of the items of an enumerated element
+    tlv - TLV words describing the dB scale, or None
+    """
+
+    def __init__(
+        self, numid, iface, name, index, type, count, minimum, maximum, items, tlv
+    ):
+        self.numid = numid
+        self.iface = iface
+        self.name = name
+        self.index = index
+        self.type = type
+        self.count = count
+        self.minimum = minimum
+        self.maximum = maximum
+        self.items = items
+        self.tlv = tlv
+
+    def to_db(self, value):
+        """Returns the gain of value in dB, as amixer shows it, or None if
+        the element has no dB scale.
+        """
+        if self.tlv is None:
+            return None
+        db = _db_from_tlv(self.tlv, self.minimum, self.maximum, value)
+        return None if db is None else db / 100.0
+
+
+class ControlDevice:
+    """The control device of a card, with the elements it had when opened.
+
+    Errors of the ioctls are raised as OSError.
+    """
+
+    def __init__(self, card_num):
+        self.path = CONTROL_DEVICE.format(card_num)
+        self.fd = os.open(self.path, os.O_RDWR | os.O_CLOEXEC)
+        try:
+            self.elements = self.__list()
+        except OSError:
+            os.close(self.fd)
+            raise
+        self._by_name = {
+            element.name: element
+            for element in self.elements
+            if element.iface == ELEM_IFACE_MIXER and element.index == 0
+        }
+
+    def fileno(self):
+        return self.fd
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+    def find(self, name, suffixes):
+        """Returns the element implementing simple control name, as amixer
+        names it, or None.
+
+        suffixes - SWITCH_SUFFIXES, VOLUME_SUFFIXES or ENUM_SUFFIXES
+        """
+        for suffix in suffixes:
+            element = self._by_name.get(name + suffix)
+            if element is not None and element.type == SUFFIX_TYPES[suffixes]:
+                return element
+        return None
+
+    def read(self, element):
+        """Returns the list of values of element, item indexes for an
+        enumerated one.
+        """
+        value = ElemValue()
+        value.id.numid = element.numid
+        fcntl.ioctl(self.fd, IOCTL_ELEM_READ, value)
+        if element.type == ELEM_TYPE_ENUMERATED:
+            return list(value.value.enumerated[: element.count])
+        return list(value.value.integer[: element.count])
+
+    def write(self, element, values):
+        """Sets the values of element, item indexes for an enumerated one."""
+        value = ElemValue()
+        value.id.numid = element.numid
+        if element.type == ELEM_TYPE_ENUMERATED:
+            data = value.value.enumerated
+        else:
+            data = value.value.integer
+        for i, v in enumerate(values):
+            data[i] = v
+        fcntl.ioctl(self.fd, IOCTL_ELEM_WRITE, value)
+
+    def subscribe(self):
+        """Asks for the change events of the elements, see read_events."""
+        fcntl.ioctl(self.fd, IOCTL_SUBSCRIBE_EVENTS, ctypes.c_int(1))
+
+    def read_events(self):
+        """Waits for change events, once subscribed, and returns them as a
+        list of (element name, EVENT_MASK_*) pairs.
+        """
+        size = ctypes.sizeof(Event)
+        data = os.read(self.fd, EVENT_BATCH * size)
+        events = []
+        for offset in range(0, len(data) - size + 1, size):
+            event = Event.from_buffer_copy(data, offset)
+            if event.type == EVENT_ELEM:
+                elem = event.data.elem
+                events.append((elem.id.name.decode(errors="replace"), elem.mask))
+        return events
+
+    def __list(self):
+        elem_list = ElemList()
+        fcntl.ioctl(self.fd, IOCTL_ELEM_LIST, elem_list)
+        ids = (ElemId * elem_list.count)()
+        elem_list.space = elem_list.count
+        elem_list.pids = ids
+        fcntl.ioctl(self.fd, IOCTL_ELEM_LIST, elem_list)
+        return [self.__element(ids[i]) for i in range(elem_list.used)]
+
+    def __info(self, numid, item=0):
+        info = ElemInfo()
+        info.id.numid = numid
+        info.value.enumerated.item = item
+        fcntl.ioctl(self.fd, IOCTL_ELEM_INFO, info)
+        return info
+
+    def __element(self, elem_id):
+        info = self.__info(elem_id.numid)
+        minimum = maximum = 0
+        items = ()
+        tlv = None
+        if info.type == ELEM_TYPE_INTEGER:
+            minimum = info.value.integer.min
+            maximum = info.value.integer.max
+            if info.access & ELEM_ACCESS_TLV_READ:
+                tlv = self.__tlv(elem_id.numid)
+        elif info.type == ELEM_TYPE_BOOLEAN:
+            maximum = 1
+        elif info.type == ELEM_TYPE_ENUMERATED:
+            items = tuple(
+                self.__info(elem_id.numid, item).value.enumerated.name.decode(
+                    errors="replace"
+                )
+                for item in range(info.value.enumerated.items)
+            )
+        return Element(
+            elem_id.numid,
+            elem_id.iface,
+            elem_id.name.decode(errors="replace"),
+            elem_id.index,
+            info.type,
+            info.count,
+            minimum,
+            maximum,
+            items,
+            tlv,
+        )
+
+    def __tlv(self, numid):
+        tlv = Tlv()
+        tlv.numid = numid
+        tlv.length = ctypes.sizeof(tlv.tlv)
+        try:
+            fcntl.ioctl(self.fd, IOCTL_TLV_READ, tlv)
+        except OSError as err:
+            logger.debug("No dB scale for element {}: {}".format(numid, err))
+            return None
+        words = min(2 + tlv.tlv[1] // 4, TLV_MAX_WORDS)
+        return tuple(tlv.tlv[:words])
+
+
+def open_card(card_num):
+    """Returns the ControlDevice of card card_num, or None if it cannot be
+    used.
+    """
+    try:
+        return ControlDevice(card_num)
+    except OSError as err:
+        level = logging.INFO if err.errno == errno.ENOENT else logging.WARNING
+        logger.log(
+            level,
+            "Unable to open {}: {}".format(CONTROL_DEVICE.format(card_num), err),
+        )
+        return None
+
+
+def main():
+    """Lists the elements of a card: alsa_ctl.py [card]"""
+    import sys
+
+    ctl = open_card(sys.argv[1] if len(sys.argv) > 1 else 0)
+    if ctl is None:
+        sys.exit(1)
+    for element in ctl.elements:
+        values = ctl.read(element)
+        if element.items:
+            values = [element.items[v] for v in values]
+        elif element.tlv is not None:
+            values = ["{} [{}dB]".format(v, element.to_db(v)) for v in values]
+        print("numid={} '{}' {}".format(element.numid, element.name, values))
+    ctl.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""
+A long running "amixer -s" process, running mixer commands sent over its
+standard input instead of starting an amixer process per command.
+
+amixer only accepts set commands on its standard input.  The process keeps
+one mixer handle open, whose simple control values are not refreshed when
+other applications change the controls, and alsa-lib skips setting a
+simple control to the value it last saw.  Controls are therefore set with
+cset, which writes the control element directly, by element name.
+
+amixer prints the element it set as a block of lines starting with
+"numid=N,iface=MIXER,name='NAME'".  Elements that are not found print
+nothing.  Every batch of commands is followed by a sentinel command, a zero
+volume step of a simple control known to exist, which prints a block
+starting with "Simple mixer control".  The reply of the last command is
+known to be complete when the sentinel block starts.  The step leaves the
+cached value unchanged, so it never writes to the control.  The remaining
+lines of the sentinel block are skipped at the next batch.
+
+amixer does not flush its replies when writing to a pipe, so it is run
+under "stdbuf -oL".  Without stdbuf every batch would wait for its reply
+until the timeout, and AmixerSession.available() is False.
+
+    session = AmixerSession(0, "Master")
+    replies = session.run(
+        [("Master Playback Volume", "200,200"), ("Digital Playback Volume", "200,200")]
+    )
+"""
+import logging
+import os
+import re
+import select
+import shutil
+import subprocess
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Seconds to wait for the reply of a batch
+REPLY_TIMEOUT = 2.0
+SIMPLE_CONTROL = "Simple mixer control '"
+# First line printed about an element set by cset
+ELEMENT = re.compile(r"^numid=\d+,iface=\w+,name='(.*)'")
+
+
+class AmixerSession:
+    """amixer process of card card_num, started on first use and after it
+    failed.  failures counts the batches failed since the last one that
+    succeeded.
+
+    sentinel - Name of a simple volume control of the card, stepped by zero
+               after every batch
+    """
+
+    def __init__(self, card_num, sentinel, timeout=REPLY_TIMEOUT):
+        self.card_num = card_num
+        self.sentinel = sentinel
+        self.timeout = timeout
+        self.starts = 0
+        self.failures = 0
+        self._proc = None
+        self._buffer = b""
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def available():
+        """Returns True if amixer sessions can be run."""
+        return shutil.which("stdbuf") is not None
+
+    def run(self, commands):
+        """Sets control elements in a single round trip.
+
+        commands - List of (element name, value) pairs, with values as
+                   "amixer cset" takes them, e.g. "200,200" or "off,off"
+
+        Returns the reply of each command, the list of lines printed about
+        its element, or None if the element was not found.  Raises OSError
+        if amixer fails, stopping the process.
+        """
+        with self._lock:
+            try:
+                replies = self.__run(commands)
+            except OSError:
+                self.failures += 1
+                self.__stop()
+                raise
+            self.failures = 0
+            return replies
+
+    def close(self):
+        with self._lock:
+            self.__stop()
+
+    def __run(self, commands):
+        if self._proc is None or self._proc.poll() is not None:
+            self.__start()
+        names = [name for name, _ in commands]
+        lines = ['cset "name={}" {}'.format(name, value) for name, value in commands]
+        lines.append('sset "{}" 0+'.format(self.sentinel))
+        self._proc.stdin.write("".join(line + "\n" for line in lines).encode())
+        self._proc.stdin.flush()
+
+        deadline = time.monotonic() + self.timeout
+        replies = [None] * len(commands)
+        reply = None
+        i = 0
+        while True:
+            line = self.__readline(deadline)
+            if line.startswith(SIMPLE_CONTROL):
+                return replies
+            match = ELEMENT.match(line)
+            if match:
+                while i < len(names) and names[i] != match.group(1):
+                    i += 1
+                if i == len(names):
+                    raise OSError("Unexpected amixer reply: {}".format(line))
+                reply = replies[i] = [line]
+                i += 1
+            elif reply is not None:
+                reply.append(line)
+            # else a line of the previous sentinel block
+
+    def __readline(self, deadline):
+        fd = self._proc.stdout.fileno()
+        while b"\n" not in self._buffer:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not select.select([fd], [], [], remaining)[0]:
+                raise TimeoutError("No reply from amixer")
+            data = os.read(fd, 4096)
+            if not data:
+                raise BrokenPipeError("amixer exited")
+            self._buffer += data
+        line, self._buffer = self._buffer.split(b"\n", 1)
+        return line.decode(errors="replace")
+
+    def __start(self):
+        cmd = ["stdbuf", "-oL", "amixer", "-c", str(self.card_num), "-s"]
+        if self.starts:
+            logger.warning("Restarting amixer session")
+        self.starts += 1
+        self._buffer = b""
+        self._proc = subprocess.Popen(
+            cmd,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+        )
+
+    def __stop(self):
+        if self._proc is None:
+            return
+        try:
+            self._proc.kill()
+        except OSError:
+            pass
+        self._proc.wait()
+        self._proc.stdin.close()
+        self._proc.stdout.close()
+        self._proc = None
@@ -18,6 +18,7 @@ along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 import argparse
 from enum import auto, Enum, IntEnum
+import json
 import logging
 import os
 import socket
@@ -26,16 +27,26 @@ import sys
 import time
 
 import fcntl
-from Hardware.SH1106.SH1106LCD import SH1106LCD
+from Hardware.SH1106.backends import (
+    CONTROLLER_SH1106,
+    CONTROLLERS,
+    OUTPUT_I2C,
+    create_display,
+)
+from Hardware.SH1106.dimmer import Dimmer
 from Hardware.I2CConfig import i2cConfig
 import IRModule
 import RPi.GPIO as GPIO
 
-from alsa import AlsaMixerBoss2
+from alsa import AlsaMixerBoss2, MixerCache
 from utils import shell_cmd
+from widgets import Label, Menu, ToggleRow, Value, View
 
 SPLASH_SCREEN_TIMEOUT = 5
+DISPLAY_DIM_TIMEOUT = 15
 DISPLAY_OFF_TIMEOUT = 30
+DISPLAY_MAX_FPS = 20
+DISPLAY_STATS_INTERVAL = 600
 LOG_FORMAT = "%(asctime)-15s [%(levelname)s] (%(name)s) %(message)s"
 LOG_LEVEL = logging.INFO
 
@@ -60,11 +71,11 @@ hp_fil = 0
 ok_flag = 0
 bit_rate = 0
 bit_format = 0
-last_bit_format = 0
 sec_flag = 0
 irp = 0
 remote_interface = None
 display_next_timeout = None
+display_dim_timeout = None
 
 
 class DisplayFlag(IntEnum):
@@ -72,6 +83,8 @@ class DisplayFlag(IntEnum):
     ON = 1
     TURN_OFF = 2
     TURN_ON = 3
+    DIMMED = 4
+    TURN_DIM = 5
 
 
 display_flag = DisplayFlag.OFF
@@ -189,32 +202,36 @@ class GUI:
         self.alsa = alsa_interface
         self.screen = Screen.INFO
         self.fp_interface = FrontPanelInterface()
+        self.dimmer = Dimmer(lcd)
         self._ip_lan = ""
         self._ip_wan = ""
         self._hostname = ""
         self._scr0_ref_count = 0
+        # Mixer change count shown by the info screen
+        self._mixer_version = None
+        self._views = self._build_views()
 
     def _get_hostname(self):
         return "HOST:{}".format(socket.gethostname())
 
     def display_splash(self):
-        lcd.display_off()
+        self.lcd.display_off()
         self._ip_lan = get_ip_address("eth0")
         self._ip_wan = get_ip_address("wlan0")
         host = self._get_hostname()
-        lcd.displayStringNumber(self._ip_lan, 0, 0)
-        lcd.displayStringNumber(self._ip_wan, 6, 0)
-        lcd.displayString(host, 2, 0)
-        lcd.displayString(A_CARD1, 4, 0)
-        lcd.display_on()
+        self.lcd.displayStringNumber(self._ip_lan, 0, 0)
+        self.lcd.displayStringNumber(self._ip_wan, 6, 0)
+        self.lcd.displayString(host, 2, 0)
+        self.lcd.displayString(A_CARD1, 4, 0)
+        self.lcd.display_on()
         time.sleep(SPLASH_SCREEN_TIMEOUT)
-        lcd.clearScreen(keep_display_off=True)
+        self.lcd.clearScreen(keep_display_off=True)
 
     def display_err(self, msg):
         col = int(self.lcd.COLUMNS / 2 - len(msg) / 2)
-        lcd.displayString(msg, row=4, col=col)
-        lcd.displayStringNumber(self._ip_lan, 0, 0)
-        lcd.displayStringNumber(self._ip_wan, 6, 0)
+        self.lcd.displayString(msg, row=4, col=col)
+        self.lcd.displayStringNumber(self._ip_lan, 0, 0)
+        self.lcd.displayStringNumber(self._ip_wan, 6, 0)
 
     def _check_switches(self):
         return self.fp_interface.get_switch_state()
@@ -247,19 +264,29 @@ class GUI:
 
     def _check_display_timeout(self):
         global display_next_timeout
+        global display_dim_timeout
         global display_flag
 
-        if time.time() >= display_next_timeout and display_flag != DisplayFlag.OFF:
+        now = time.time()
+        if now >= display_next_timeout and display_flag != DisplayFlag.OFF:
             display_flag = DisplayFlag.TURN_OFF
+        elif now >= display_dim_timeout and display_flag == DisplayFlag.ON:
+            display_flag = DisplayFlag.TURN_DIM
 
         if display_flag == DisplayFlag.TURN_OFF:
             logger.debug("Display OFF")
             self.lcd.display_off()
             display_flag = DisplayFlag.OFF
+        elif display_flag == DisplayFlag.TURN_DIM:
+            logger.debug("Display DIM")
+            self.dimmer.dim()
+            display_flag = DisplayFlag.DIMMED
         elif display_flag == DisplayFlag.TURN_ON:
             logger.debug("Display ON")
+            self.dimmer.wake()
             self.lcd.display_on()
             display_flag = DisplayFlag.ON
+        self.dimmer.update()
 
     def handle_left(self):
         global hv_en
@@ -513,338 +540,203 @@ class GUI:
             sec_flag = 1
             self._scr0_ref_count = 0
 
-        switches = self._check_switches()
-        if any(switches.values()):
-            reset_display_timeout()
-
-        if (
-            switches[Switch.LEFT]
-            or remote_interface.get_button_state(RemoteButton.LEFT) == 1
-        ):
-            self.handle_left()
-
-        if remote_interface.get_button_state(RemoteButton.MUTE):
-            self.handle_mute()
-
-        if switches[Switch.OK] or remote_interface.get_button_state(RemoteButton.OK):
-            self.handle_ok()
+        # Everything drawn in response to this update goes out as one frame
+        with self.lcd.frame():
+            switches = self._check_switches()
+            if any(switches.values()):
+                reset_display_timeout()
+
+            if (
+                switches[Switch.LEFT]
+                or remote_interface.get_button_state(RemoteButton.LEFT) == 1
+            ):
+                self.handle_left()
+
+            if remote_interface.get_button_state(RemoteButton.MUTE):
+                self.handle_mute()
+
+            if switches[Switch.OK] or remote_interface.get_button_state(
+                RemoteButton.OK
+            ):
+                self.handle_ok()
+
+            if switches[Switch.UP] or remote_interface.get_button_state(
+                RemoteButton.UP
+            ):
+                self.handle_up()
+
+            if switches[Switch.DOWN] or remote_interface.get_button_state(
+                RemoteButton.DOWN
+            ):
+                self.handle_down()
+
+            if switches[Switch.RIGHT] or remote_interface.get_button_state(
+                RemoteButton.RIGHT
+            ):
+                self.handle_right()
 
-        if switches[Switch.UP] or remote_interface.get_button_state(RemoteButton.UP):
-            self.handle_up()
-
-        if switches[Switch.DOWN] or remote_interface.get_button_state(
-            RemoteButton.DOWN
-        ):
-            self.handle_down()
-
-        if switches[Switch.RIGHT] or remote_interface.get_button_state(
-            RemoteButton.RIGHT
-        ):
-            self.handle_right()
-
-        if sec_flag == 1:
             if self.screen == Screen.INFO:
-                self.screenVol()
-                sec_flag = 0
+                if sec_flag == 1 or self.alsa.version != self._mixer_version:
+                    self.screenVol()
+                    sec_flag = 0
 
     def infoScr(self):
         if self.screen != Screen.INFO:
             self.screen = Screen.INFO
-            lcd.clearScreen()
+            self.lcd.clearScreen()
 
-        lcd.displayString("VOL", 1, 0)
-        lcd.displayString("0.0dB", 1, 60)
-        lcd.displayString("PCM/DSD", 3, 0)
-        lcd.displayString("SR", 5, 0)
-        lcd.displayString("44.1kHz", 5, 60)
+        self.lcd.displayString("VOL", 1, 0)
+        self.lcd.displayString("0.0dB", 1, 60)
+        self.lcd.displayString("PCM/DSD", 3, 0)
+        self.lcd.displayString("SR", 5, 0)
+        self.lcd.displayString("44.1kHz", 5, 60)
+
+    def _build_views(self):
+        """Returns the widgets of each screen drawn through a View."""
+        views = {
+            Screen.INFO: View(
+                Value(1, 20, "{:.2f}dB"),
+                Label(3, 50),
+                Label(5, 5),
+                Value(5, 15),
+                Value(5, 50),
+            ),
+            Screen.MENU: View(
+                Menu(
+                    [
+                        Label(0, 0, "SYSINFO"),
+                        Label(2, 0),
+                        Label(4, 0, "FILTER"),
+                        Label(6, 0),
+                    ]
+                )
+            ),
+            Screen.FILTER: View(
+                Menu(
+                    [
+                        ToggleRow(0, "PHCOMP "),
+                        ToggleRow(2, "HP-FIL "),
+                        ToggleRow(4, "DE-EMP "),
+                        ToggleRow(6, "NON-OS "),
+                    ]
+                )
+            ),
+        }
+        # Screens choosing between two options, the current one highlighted
+        for screen, title, title_col, first, second in (
+            (Screen.HV, "HV ENABLE", 20, ("ON", 20), ("OFF", 70)),
+            (Screen.SP, "FILTER SPEED", 5, ("FAST", 10), ("SLOW", 80)),
+            (Screen.HP, "HP-FILT", 20, ("EN", 10), ("DIS", 70)),
+            (Screen.DE_EMPHASIS, "DE-EMPH", 20, ("EN", 10), ("DIS", 70)),
+            (Screen.NON_OSAMP, "NON-OSAMP", 20, ("EN", 10), ("DIS", 70)),
+            (Screen.PHASE_COMPENSATION, "PHA-COMP", 20, ("EN", 10), ("DIS", 70)),
+        ):
+            views[screen] = View(
+                Label(0, title_col, title),
+                Label(3, first[1], first[0]),
+                Label(3, second[1], second[0]),
+                Label(6, 50, "OK"),
+            )
+        return views
+
+    def _show(self, screen):
+        """Switches to screen, clearing the display if it was showing another
+        one, and returns the View of screen.
+        """
+        view = self._views[screen]
+        if self.screen != screen:
+            self.screen = screen
+            self.lcd.clearScreen()
+            view.forget()
+        return view
 
     def menuScr(self):
-        global m_indx
-        if self.screen != Screen.MENU:
-            self.screen = Screen.MENU
-            lcd.clearScreen()
-        if m_indx == 1:
-            lcd.displayInvertedString("SYSINFO", 0, 0)
-        else:
-            lcd.displayString("SYSINFO", 0, 0)
-        if m_indx == 2:
-            if hv_en == 0:
-                lcd.displayInvertedString("HV-EN OFF", 2, 0)
-            else:
-                lcd.displayInvertedString("HV-EN ON", 2, 0)
-        else:
-            if hv_en == 0:
-                lcd.displayString("HV-EN OFF", 2, 0)
-            else:
-                lcd.displayString("HV-EN ON", 2, 0)
-        if m_indx == 3:
-            lcd.displayInvertedString("FILTER", 4, 0)
-        else:
-            lcd.displayString("FILTER", 4, 0)
-        if m_indx == 4:
-            if fil_sp == 1:
-                lcd.displayInvertedString("F-SPEED-FAS", 6, 0)
-            else:
-                lcd.displayInvertedString("F-SPEED-SLO", 6, 0)
-        else:
-            if fil_sp == 1:
-                lcd.displayString("F-SPEED-FAS", 6, 0)
-            else:
-                lcd.displayString("F-SPEED-SLO", 6, 0)
+        view = self._show(Screen.MENU)
+        (menu,) = view.widgets
+        _, hv, _, speed = menu.items
+        hv.text = "HV-EN OFF" if hv_en == 0 else "HV-EN ON"
+        speed.text = "F-SPEED-FAS" if fil_sp == 1 else "F-SPEED-SLO"
+        menu.selected = m_indx - 1
+        view.paint(self.lcd)
 
     def bootScr(self):
         host = self._get_hostname()
         if self.screen != Screen.BOOT:
             self.screen = Screen.BOOT
-            lcd.clearScreen()
-        lcd.clearScreen()
+            self.lcd.clearScreen()
+        self.lcd.clearScreen()
         self._ip_lan = get_ip_address("eth0")
         self._ip_wan = get_ip_address("wlan0")
-        lcd.displayString(A_CARD1, 0, 0)
-        lcd.displayStringNumber(self._ip_lan, 2, 0)
-        lcd.displayString(host, 4, 0)
-        lcd.displayStringNumber(self._ip_wan, 6, 0)
+        self.lcd.displayString(A_CARD1, 0, 0)
+        self.lcd.displayStringNumber(self._ip_lan, 2, 0)
+        self.lcd.displayString(host, 4, 0)
+        self.lcd.displayStringNumber(self._ip_wan, 6, 0)
 
     def filtScr(self):
-        global fil_sp
-        global hp_fil
-        global de_emp
-        global non_os
-        global ph_comp
-        global f_indx
-        if self.screen != Screen.FILTER:
-            self.screen = Screen.FILTER
-            lcd.clearScreen()
-        if f_indx == 1:
-            lcd.displayInvertedString("PHCOMP ", 0, 5)
-            lcd.displayInvertedString("| ", 0, 64)
-            if ph_comp == 0:
-                lcd.displayInvertedString("DIS", 0, 80)
-            else:
-                lcd.displayInvertedString("EN", 0, 80)
-        else:
-            lcd.displayString("PHCOMP ", 0, 5)
-            lcd.displayString("| ", 0, 64)
-            if ph_comp == 0:
-                lcd.displayString("DIS", 0, 80)
-            else:
-                lcd.displayString("EN", 0, 80)
-
-        if f_indx == 2:
-            lcd.displayInvertedString("HP-FIL ", 2, 5)
-            lcd.displayInvertedString("| ", 2, 64)
-            if hp_fil == 0:
-                lcd.displayInvertedString("DIS", 2, 80)
-            else:
-                lcd.displayInvertedString("EN", 2, 80)
-        else:
-            lcd.displayString("HP-FIL ", 2, 5)
-            lcd.displayString("| ", 2, 64)
-            if hp_fil == 0:
-                lcd.displayString("DIS", 2, 80)
-            else:
-                lcd.displayString("EN", 2, 80)
-        if f_indx == 3:
-            lcd.displayInvertedString("DE-EMP ", 4, 5)
-            lcd.displayInvertedString("| ", 4, 64)
-            if de_emp == 0:
-                lcd.displayInvertedString("DIS", 4, 80)
-            else:
-                lcd.displayInvertedString("EN", 4, 80)
-        else:
-            lcd.displayString("DE-EMP ", 4, 5)
-            lcd.displayString("| ", 4, 64)
-            if de_emp == 0:
-                lcd.displayString("DIS", 4, 80)
-            else:
-                lcd.displayString("EN", 4, 80)
-        if f_indx == 4:
-            lcd.displayInvertedString("NON-OS ", 6, 5)
-            lcd.displayInvertedString("| ", 6, 64)
-            if non_os == 0:
-                lcd.displayInvertedString("DIS", 6, 80)
-            else:
-                lcd.displayInvertedString("EN", 6, 80)
-        else:
-            lcd.displayString("NON-OS ", 6, 5)
-            lcd.displayString("| ", 6, 64)
-            if non_os == 0:
-                lcd.displayString("DIS", 6, 80)
-            else:
-                lcd.displayString("EN", 6, 80)
+        view = self._show(Screen.FILTER)
+        (menu,) = view.widgets
+        settings = (ph_comp, hp_fil, de_emp, non_os)
+        for row, setting in zip(menu.items, settings):
+            row.enabled = setting != 0
+        menu.selected = f_indx - 1
+        view.paint(self.lcd)
+
+    def _choiceScr(self, screen, second_selected):
+        """Draws a screen built by _build_views choosing between two
+        options.
+        """
+        view = self._show(screen)
+        _, first, second, ok = view.widgets
+        first.selected = not second_selected
+        second.selected = second_selected
+        ok.selected = ok_flag == 1
+        view.paint(self.lcd)
 
     def hvScr4(self):
-        global hv_en
-        global ok_flag
-        if self.screen != Screen.HV:
-            self.screen = Screen.HV
-            lcd.clearScreen()
-        lcd.displayString("HV ENABLE", 0, 20)
-        if hv_en == 0:
-            lcd.displayString("ON", 3, 20)
-            lcd.displayInvertedString("OFF", 3, 70)
-        else:
-            lcd.displayInvertedString("ON", 3, 20)
-            lcd.displayString("OFF", 3, 70)
-        if ok_flag == 1:
-            lcd.displayInvertedString("OK", 6, 50)
-        else:
-            lcd.displayString("OK", 6, 50)
+        self._choiceScr(Screen.HV, hv_en == 0)
 
     def spScr5(self):
-        global fil_sp
-        global ok_flag
-        if self.screen != Screen.SP:
-            self.screen = Screen.SP
-            lcd.clearScreen()
-        lcd.displayString("FILTER SPEED", 0, 5)
-        if fil_sp == 0:
-            lcd.displayString("FAST", 3, 10)
-            lcd.displayInvertedString("SLOW", 3, 80)
-        else:
-            lcd.displayInvertedString("FAST", 3, 10)
-            lcd.displayString("SLOW", 3, 80)
-        if ok_flag == 1:
-            lcd.displayInvertedString("OK", 6, 50)
-        else:
-            lcd.displayString("OK", 6, 50)
+        self._choiceScr(Screen.SP, fil_sp == 0)
 
     def hpScr6(self):
-        global ok_flag
-        global hp_fil
-        if self.screen != Screen.HP:
-            self.screen = Screen.HP
-            lcd.clearScreen()
-        lcd.displayString("HP-FILT", 0, 20)
-        if hp_fil == 0:
-            lcd.displayString("EN", 3, 10)
-            lcd.displayInvertedString("DIS", 3, 70)
-        else:
-            lcd.displayInvertedString("EN", 3, 10)
-            lcd.displayString("DIS", 3, 70)
-        if ok_flag == 1:
-            lcd.displayInvertedString("OK", 6, 50)
-        else:
-            lcd.displayString("OK", 6, 50)
+        self._choiceScr(Screen.HP, hp_fil == 0)
 
     def deScr7(self):
-        global de_emp
-        global ok_flag
-        if self.screen != Screen.DE_EMPHASIS:
-            self.screen = Screen.DE_EMPHASIS
-            lcd.clearScreen()
-        lcd.displayString("DE-EMPH", 0, 20)
-        if de_emp == 0:
-            lcd.displayString("EN", 3, 10)
-            lcd.displayInvertedString("DIS", 3, 70)
-        else:
-            lcd.displayInvertedString("EN", 3, 10)
-            lcd.displayString("DIS", 3, 70)
-        if ok_flag == 1:
-            lcd.displayInvertedString("OK", 6, 50)
-        else:
-            lcd.displayString("OK", 6, 50)
+        self._choiceScr(Screen.DE_EMPHASIS, de_emp == 0)
 
     def nonScr8(self):
-        global non_os
-        global ok_flag
-        if self.screen != Screen.NON_OSAMP:
-            self.screen = Screen.NON_OSAMP
-            lcd.clearScreen()
-        lcd.displayString("NON-OSAMP", 0, 20)
-        if non_os == 0:
-            lcd.displayString("EN", 3, 10)
-            lcd.displayInvertedString("DIS", 3, 70)
-        else:
-            lcd.displayInvertedString("EN", 3, 10)
-            lcd.displayString("DIS", 3, 70)
-        if ok_flag == 1:
-            lcd.displayInvertedString("OK", 6, 50)
-        else:
-            lcd.displayString("OK", 6, 50)
+        self._choiceScr(Screen.NON_OSAMP, non_os == 0)
 
     def phScr9(self):
-        global ph_comp
-        global ok_flag
-        if self.screen != Screen.PHASE_COMPENSATION:
-            self.screen = Screen.PHASE_COMPENSATION
-            lcd.clearScreen()
-        lcd.displayString("PHA-COMP", 0, 20)
-        if ph_comp == 0:
-            lcd.displayString("EN", 3, 10)
-            lcd.displayInvertedString("DIS", 3, 70)
-        else:
-            lcd.displayInvertedString("EN", 3, 10)
-            lcd.displayString("DIS", 3, 70)
-        if ok_flag == 1:
-            lcd.displayInvertedString("OK", 6, 50)
-        else:
-            lcd.displayString("OK", 6, 50)
+        self._choiceScr(Screen.PHASE_COMPENSATION, ph_comp == 0)
 
     def screenVol(self):
         global bit_rate
         global bit_format
-        global last_bit_format
-        if self.screen != Screen.INFO:
-            self.screen = Screen.INFO
-            lcd.clearScreen()
+        view = self._show(Screen.INFO)
+        volume, mute_label, sample_label, bits, rate = view.widgets
+        self._mixer_version = self.alsa.version
 
         _, left_db, _ = self.alsa.getVol()
-        alsa_vol = "{:.2f}dB".format(left_db)
-        if left_db == 0.0:
-            lcd.displayString("    ", 1, 80)
-        elif left_db > -10.0:
-            lcd.displayString("    ", 1, 90)
-        elif left_db > -100.0:
-            lcd.displayString("  ", 1, 100)
-        lcd.displayString(alsa_vol, 1, 20)
+        volume.value = left_db
         mute = self.alsa.getMuteStatus(self.alsa.CONTROL.MA_CTRL)
-        if mute == 0:
-            lcd.displayString("@", 3, 50)
-        else:
-            lcd.displayString("  ", 3, 50)
+        mute_label.text = "@" if mute == 0 else ""
         hw_format, hw_rate_num = self.alsa.getHwparam()
 
         # display hw info
-        if hw_format == "S24_LE":
-            bit_rate = "24"
+        if hw_format in ("S16_LE", "S24_LE", "S32_LE"):
+            bit_rate = hw_format[1:3]
             bit_format = hw_rate_num
-            bit_format1 = str(bit_format)
-            lcd.displayString(bit_rate, 5, 15)
-            lcd.displayString("S", 5, 5)
-            if last_bit_format != bit_format1:
-                lcd.displayString("        ", 5, 50)
-                last_bit_format = bit_format1
-            lcd.displayString(bit_format1, 5, 50)
-            reset_display_timeout()
-        elif hw_format == "S32_LE":
-            bit_rate = "32"
-            bit_format = hw_rate_num
-            bit_format1 = str(bit_format)
-            lcd.displayString(bit_rate, 5, 15)
-            lcd.displayString("S", 5, 5)
-            if last_bit_format != bit_format1:
-                lcd.displayString("        ", 5, 50)
-                last_bit_format = bit_format1
-            lcd.displayString(bit_format1, 5, 50)
-            reset_display_timeout()
-        elif hw_format == "S16_LE":
-            bit_rate = "16"
-            bit_format = hw_rate_num
-            bit_format1 = str(bit_format)
-            lcd.displayString(bit_rate, 5, 15)
-            lcd.displayString("S", 5, 5)
-            if last_bit_format != bit_format1:
-                lcd.displayString("        ", 5, 50)
-                last_bit_format = bit_format1
-            lcd.displayString(bit_format1, 5, 50)
+            sample_label.text = "S"
+            bits.value = bit_rate
+            rate.value = bit_format
             reset_display_timeout()
         else:
             bit_rate = "closed"
-            lcd.displayStringNumber("   ", 5, 15)
-            lcd.displayString(" ", 5, 5)
-            lcd.displayString("        ", 5, 50)
-            last_bit_format = 0
+            sample_label.text = ""
+            bits.value = None
+            rate.value = None
+        view.paint(self.lcd)
 
 
 def getCardNumber():
@@ -912,27 +804,77 @@ def gpio_cleanup():
 def reset_display_timeout():
     global display_flag
     global display_next_timeout
+    global display_dim_timeout
 
     display_next_timeout = time.time() + DISPLAY_OFF_TIMEOUT
+    display_dim_timeout = time.time() + DISPLAY_DIM_TIMEOUT
     if display_flag != DisplayFlag.ON:
         display_flag = DisplayFlag.TURN_ON
     logger.debug("Display timeout reset +{}s".format(DISPLAY_OFF_TIMEOUT))
 
 
+def log_display_stats(lcd):
+    logger.info(
+        "Display I2C stats: {}".format(json.dumps(lcd.transportStats(), sort_keys=True))
+    )
+
+
 def shutdown_lcd(lcd):
     try:
+        lcd.close()
         lcd.display_off()
         lcd.clearScreen()
     except Exception as err:
         logger.warning("Unable to clear LCD: {}".format(err))
 
 
+def positive_float(value):
+    """argparse type for options that must be greater than zero."""
+    number = float(value)
+    if not number > 0:
+        raise argparse.ArgumentTypeError("must be greater than 0: {}".format(value))
+    return number
+
+
 def main():
     global lcd
     global remote_interface
 
     parser = argparse.ArgumentParser(description="Run Allo Boss2 front panel interface")
     parser.add_argument("--logfile", dest="log_file", action="store", default=None)
+    parser.add_argument(
+        "--async-display",
+        dest="async_display",
+        action="store_true",
+        help="update the display from a background thread",
+    )
+    parser.add_argument(
+        "--max-fps",
+        dest="max_fps",
+        type=positive_float,
+        default=DISPLAY_MAX_FPS,
+        help="maximum display refresh rate with --async-display",
+    )
+    parser.add_argument(
+        "--display",
+        dest="display",
+        choices=sorted(CONTROLLERS),
+        default=CONTROLLER_SH1106,
+        help="display controller",
+    )
+    parser.add_argument(
+        "--display-output",
+        dest="display_output",
+        default=OUTPUT_I2C,
+        help="where to draw: i2c, terminal, or an image file (.pgm or .png)",
+    )
+    parser.add_argument(
+        "--stats-interval",
+        dest="stats_interval",
+        type=float,
+        default=DISPLAY_STATS_INTERVAL,
+        help="seconds between display I2C statistics log entries (0 to disable)",
+    )
     args = parser.parse_args()
     if args.log_file:
         logging.basicConfig(
@@ -944,11 +886,17 @@ def main():
     if os.name != "posix":
         sys.exit("platform not supported")
     reset_display_timeout()
-    i2cConfig()
-    lcd = SH1106LCD()
+    if args.display_output == OUTPUT_I2C:
+        i2cConfig()
+    lcd = create_display(
+        args.display,
+        args.display_output,
+        async_flush=args.async_display,
+        max_fps=args.max_fps,
+    )
 
     card_num = getCardNumber()
-    alsa_boss2 = AlsaMixerBoss2(card_num, A_CARD1)
+    alsa_boss2 = MixerCache(AlsaMixerBoss2(card_num, A_CARD1))
     gui = GUI(lcd, alsa_boss2)
     gui.display_splash()
 
@@ -957,6 +905,8 @@ def main():
         gui.display_err("NO BOSS2")
         exit(0)
 
+    if not alsa_boss2.start():
+        logger.warning("Mixer changes not followed, polling the mixer")
     time.sleep(0.04)
 
     remote_interface = RemoteInterface()
@@ -971,9 +921,15 @@ def main():
     try:
         gui.screenVol()
         hp_fil, hv_en, non_os, ph_comp, de_emp, fil_sp = alsa_boss2.update_status()
+        next_stats_log = time.time() + args.stats_interval
+        mixer_version = alsa_boss2.version
         while True:
             gui.do_update()
-            time.sleep(0.1)
+            if args.stats_interval > 0 and time.time() >= next_stats_log:
+                log_display_stats(lcd)
+                next_stats_log = time.time() + args.stats_interval
+            # Woken up early by mixer changes, such as volume set elsewhere
+            mixer_version = alsa_boss2.wait(mixer_version, 0.1)
     except KeyboardInterrupt:
         logger.info("Interrupted by user.")
     finally:
@@ -42,6 +42,11 @@ function install_py_files {
     sudo cp -v -r ${BASE_DIR} ${INSTALL_DIR}
 }
 
+function build_font_atlases {
+    echo Building font atlases...
+    (cd ${INSTALL_DIR} && sudo ${VENV_PATH}/bin/python -m Hardware.SH1106.fontatlas)
+}
+
 check_py
 
 
@@ -168,6 +173,7 @@ if [ $HOSTNAME == "osmc" ] || [ -z $(id -u osmc &>/dev/null) ]; then
 
     install_py_environment
     install_py_files
+    build_font_atlases
 
     # Install and enable service
     SERVICE=osmc-boss2oled.service
@@ -0,0 +1,361 @@
+"""
+Retained-mode widgets for the front panel screens.
+
+A screen is a View holding widgets, each of which remembers what it shows
+and the box it was last drawn in.  Changing a widget's text, value or
+selection only invalidates it when the new state differs from the old one,
+and View.paint() redraws nothing but the invalid widgets, blanking the part
+of their previous box that the new content no longer covers.  A Menu
+repaints the row losing the highlight and the row gaining it from cached
+row bitmaps, not the whole screen.
+
+Boxes are (row range, column range) pairs in display rows (pages) and
+columns, as taken by SH1106LCD.clear_region.
+"""
+
+# Rows (pages) taken by a line of text
+TEXT_ROWS = 2
+# Columns covered by a menu row
+MENU_WIDTH = 128
+
+
+def _uncovered(old, new):
+    """Returns the parts of box old outside of box new, as boxes."""
+    old_rows, old_cols = old
+    new_rows, new_cols = new
+    if old_rows != new_rows or not new_cols:
+        return [old]
+    parts = []
+    if old_cols.start < new_cols.start:
+        parts.append(
+            (old_rows, range(old_cols.start, min(old_cols.stop, new_cols.start)))
+        )
+    if old_cols.stop > new_cols.stop:
+        parts.append(
+            (old_rows, range(max(old_cols.start, new_cols.stop), old_cols.stop))
+        )
+    return parts
+
+
+class Widget:
+    """Base class of the widgets, drawn at row and col."""
+
+    def __init__(self, row, col):
+        self.row = row
+        self.col = col
+        self._box = None
+        self._valid = False
+
+    @property
+    def valid(self):
+        """False if the widget changed since it was last painted."""
+        return self._valid
+
+    def invalidate(self):
+        self._valid = False
+
+    def forget(self):
+        """Invalidates the widget after the screen was cleared, so that its
+        previous box is not blanked again.
+        """
+        self._box = None
+        self._valid = False
+
+    def _update(self, name, value):
+        """Sets attribute name to value, invalidating the widget if it
+        changed.
+        """
+        if getattr(self, name) != value:
+            setattr(self, name, value)
+            self._valid = False
+
+    def box(self, lcd):
+        """Returns the box the widget takes with its current content."""
+        raise NotImplementedError
+
+    def draw(self, lcd):
+        """Draws the current content."""
+        raise NotImplementedError
+
+    def paint(self, lcd):
+        """Draws the widget and blanks what is left of its previous box."""
+        box = self.box(lcd)
+        if self._box is not None:
+            for rows, cols in _uncovered(self._box, box):
+                if cols:
+                    lcd.clear_region(rows, cols)
+        self.draw(lcd)
+        self._box = box
+        self._valid = True
+
+
+class Label(Widget):
+    """A line of text, drawn inverted while selected."""
+
+    def __init__(self, row, col, text="", selected=False):
+        super().__init__(row, col)
+        self._text = text
+        self._selected = selected
+
+    @property
+    def text(self):
+        return self._text
+
+    @text.setter
+    def text(self, text):
+        self._update("_text", text)
+
+    @property
+    def selected(self):
+        return self._selected
+
+    @selected.setter
+    def selected(self, selected):
+        self._update("_selected", bool(selected))
+
+    def box(self, lcd):
+        return (
+            range(self.row, self.row + TEXT_ROWS),
+            range(self.col, self.col + lcd.textWidth(self._text)),
+        )
+
+    def segments(self):
+        """Returns the (column, text) pieces the widget draws."""
+        return ((self.col, self._text),)
+
+    def draw(self, lcd):
+        if not self._text:
+            return
+        if self._selected:
+            lcd.displayInvertedString(self._text, self.row, self.col)
+        else:
+            lcd.displayString(self._text, self.row, self.col)
+
+
+class Value(Label):
+    """A value shown through a format string, or nothing while it is
+    None.
+    """
+
+    def __init__(self, row, col, fmt="{}", value=None):
+        super().__init__(row, col)
+        self.fmt = fmt
+        self.value = value
+
+    @property
+    def value(self):
+        return self._value
+
+    @value.setter
+    def value(self, value):
+        self._value = value
+        self.text = "" if value is None else self.fmt.format(value)
+
+
+class ToggleRow(Widget):
+    """A menu row showing a setting and whether it is enabled:
+
+        LABEL  | EN
+
+    The whole row is drawn inverted while selected.
+    """
+
+    def __init__(
+        self,
+        row,
+        label,
+        enabled=False,
+        col=5,
+        separator_col=64,
+        value_col=80,
+        on_text="EN",
+        off_text="DIS",
+    ):
+        super().__init__(row, col)
+        self.on_text = on_text
+        self.off_text = off_text
+        self._label = Label(row, col, label)
+        self._separator = Label(row, separator_col, "| ")
+        self._value = Label(row, value_col)
+        self._parts = (self._label, self._separator, self._value)
+        self.enabled = enabled
+
+    @property
+    def enabled(self):
+        return self._enabled
+
+    @enabled.setter
+    def enabled(self, enabled):
+        self._enabled = bool(enabled)
+        self._value.text = self.on_text if self._enabled else self.off_text
+
+    @property
+    def selected(self):
+        return self._label.selected
+
+    @selected.setter
+    def selected(self, selected):
+        for part in self._parts:
+            part.selected = selected
+
+    @property
+    def valid(self):
+        return all(part.valid for part in self._parts)
+
+    def invalidate(self):
+        for part in self._parts:
+            part.invalidate()
+
+    def forget(self):
+        for part in self._parts:
+            part.forget()
+
+    def segments(self):
+        return tuple(segment for part in self._parts for segment in part.segments())
+
+    def box(self, lcd):
+        value_rows, value_cols = self._value.box(lcd)
+        return value_rows, range(self.col, value_cols.stop)
+
+    def paint(self, lcd):
+        """Repaints the parts of the row that changed."""
+        for part in self._parts:
+            if not part.valid:
+                part.paint(lcd)
+
+
+class Bar(Widget):
+    """A horizontal bar one row (page) high, filled in proportion to value
+    between 0 and maximum.
+    """
+
+    FILLED = 0x7E
+    EMPTY = 0x42
+    EDGE = 0x7E
+
+    def __init__(self, row, col, width, maximum, value=0):
+        super().__init__(row, col)
+        self.width = width
+        self.maximum = maximum
+        self._filled = None
+        self.value = value
+
+    @property
+    def value(self):
+        return self._value
+
+    @value.setter
+    def value(self, value):
+        self._value = min(max(value, 0), self.maximum)
+        inner = self.width - 2
+        self._update("_filled", inner * self._value // self.maximum)
+
+    def box(self, lcd):
+        return range(self.row, self.row + 1), range(self.col, self.col + self.width)
+
+    def draw(self, lcd):
+        inner = self.width - 2
+        data = (
+            bytes([self.EDGE])
+            + bytes([self.FILLED]) * self._filled
+            + bytes([self.EMPTY]) * (inner - self._filled)
+            + bytes([self.EDGE])
+        )
+        lcd.displayPageBytes(data, self.row, self.col)
+
+
+class Menu(Widget):
+    """A list of rows, such as Labels or ToggleRows, of which the selected
+    one is highlighted.
+
+    Every row is drawn as a whole, MENU_WIDTH columns wide, from a bitmap
+    cached per content and highlight.  Moving the selection repaints the
+    row losing the highlight and the row gaining it, and nothing else.
+    """
+
+    def __init__(self, items, width=MENU_WIDTH):
+        super().__init__(items[0].row, 0)
+        self.items = list(items)
+        self.width = width
+        self._index = None
+        # (segments, selected) of each row as last painted
+        self._painted = [None] * len(self.items)
+        self._bitmaps = {}
+
+    @property
+    def selected(self):
+        """Index of the highlighted row, or None."""
+        return self._index
+
+    @selected.setter
+    def selected(self, index):
+        if index == self._index:
+            return
+        for i in (self._index, index):
+            if i is not None:
+                self.items[i].selected = i == index
+        self._index = index
+
+    @property
+    def valid(self):
+        return all(
+            painted == self.__key(item)
+            for painted, item in zip(self._painted, self.items)
+        )
+
+    def invalidate(self):
+        self._painted = [None] * len(self.items)
+
+    def forget(self):
+        self.invalidate()
+
+    def box(self, lcd):
+        first = min(item.row for item in self.items)
+        last = max(item.row for item in self.items)
+        return range(first, last + TEXT_ROWS), range(self.col, self.col + self.width)
+
+    def paint(self, lcd):
+        """Repaints the rows whose content or highlight changed."""
+        for i, item in enumerate(self.items):
+            key = self.__key(item)
+            if key == self._painted[i]:
+                continue
+            for page, data in enumerate(self.__bitmap(lcd, key)):
+                lcd.displayPageBytes(data, item.row + page, self.col)
+            self._painted[i] = key
+
+    def __key(self, item):
+        return item.segments(), item.selected
+
+    def __bitmap(self, lcd, key):
+        """Returns the page bytes of a row, rendering them on first use."""
+        bitmap = self._bitmaps.get(key)
+        if bitmap is None:
+            segments, selected = key
+            bitmap = [bytearray(self.width) for _ in range(TEXT_ROWS)]
+            for col, text in segments:
+                start = col - self.col
+                for page, data in zip(bitmap, lcd.renderString(text, selected)):
+                    data = data[: self.width - start]
+                    page[start : start + len(data)] = data
+            bitmap = self._bitmaps[key] = [bytes(page) for page in bitmap]
+        return bitmap
+
+
+class View:
+    """The widgets of one screen."""
+
+    def __init__(self, *widgets):
+        self.widgets = list(widgets)
+
+    def forget(self):
+        """Invalidates every widget after the screen was cleared."""
+        for widget in self.widgets:
+            widget.forget()
+
+    def paint(self, lcd):
+        """Repaints the invalid widgets as a single display frame."""
+        with lcd.frame():
+            for widget in self.widgets:
+                if not widget.valid:
+                    widget.paint(lcd)